@@ -0,0 +1,137 @@
+import io
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field
+
+from ...core.config import settings
+from ...core.profiling import profile_store
+from ...dependencies.database import get_db
+from ...models.user import UserRole
+from ...models.submission import SubmissionStatus
+from ...schemas.submission import SubmissionOut
+from ...schemas.profile import ResidentProfileOut
+from ...services.document_dedup_service import duplicate_flags, document_hash_index
+from ...services.submission_service import update_submission_status
+from ...services.profile_service import get_profile, profile_as_dict
+from ...services.auth_service import bulk_verify_users, bulk_set_user_role, import_users_from_csv
+
+router = APIRouter()
+
+
+class SubmissionStatusRequest(BaseModel):
+    status: SubmissionStatus
+    note: str = ""
+
+
+class BulkVerifyRequest(BaseModel):
+    user_ids: List[int] = Field(..., max_length=10000)
+
+
+class BulkRoleRequest(BaseModel):
+    user_ids: List[int] = Field(..., max_length=10000)
+    role: UserRole
+
+
+class BulkUpdateResponse(BaseModel):
+    updated: int
+
+
+@router.post("/submissions/{submission_id}/status", response_model=SubmissionOut)
+async def set_submission_status(
+    submission_id: int,
+    payload: SubmissionStatusRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Admin endpoint: Approve, request a correction on, or reject a submission.
+    The resident is notified asynchronously via the outbox.
+    For prototyping: simplified (no role check).
+    """
+    try:
+        return await update_submission_status(
+            db=db, submission_id=submission_id, status=payload.status, note=payload.note
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/duplicate-flags")
+async def list_duplicate_flags():
+    """
+    Admin endpoint: uploads that look like another resident's ID.
+    For prototyping: simplified (no role check).
+    """
+    return {"flags": list(duplicate_flags), "indexed_documents": len(document_hash_index)}
+
+
+@router.get("/users/{user_id}/profile", response_model=ResidentProfileOut)
+async def get_resident_profile(user_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Admin endpoint: A resident's confirmed profile and which approved
+    submission each field came from.
+    For prototyping: simplified (no role check).
+    """
+    profile = await get_profile(db, user_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile_as_dict(profile)
+
+
+@router.post("/users/bulk-verify", response_model=BulkUpdateResponse)
+async def bulk_verify(payload: BulkVerifyRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Admin endpoint: Verify many users at once after in-person checks.
+    For prototyping: simplified (no role check).
+    """
+    return BulkUpdateResponse(updated=await bulk_verify_users(db=db, user_ids=payload.user_ids))
+
+
+@router.post("/users/bulk-role", response_model=BulkUpdateResponse)
+async def bulk_role(payload: BulkRoleRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Admin endpoint: Set the role of many users at once.
+    For prototyping: simplified (no role check).
+    """
+    return BulkUpdateResponse(updated=await bulk_set_user_role(db=db, user_ids=payload.user_ids, role=payload.role))
+
+
+@router.post("/users/import")
+async def import_users(file: UploadFile = File(..., description="CSV with email,name,password[,verified]"), db: AsyncSession = Depends(get_db)):
+    """
+    Admin endpoint: Register an existing resident list from CSV.
+    Duplicate emails (in the file or already registered) are skipped and reported.
+    For prototyping: simplified (no role check).
+    """
+    lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return await import_users_from_csv(db=db, lines=lines, batch_size=settings.BULK_IMPORT_BATCH_SIZE)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/profiles")
+async def list_profiles():
+    """
+    Admin endpoint: Recent request profiles with per-stage wall/CPU/await time.
+    For prototyping: simplified (no role check).
+    """
+    return {"profiles": profile_store.list()}
+
+
+@router.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse)
+async def download_profile(profile_id: str):
+    """
+    Admin endpoint: Stack samples of one profile in folded format,
+    for flamegraph.pl or speedscope.
+    For prototyping: simplified (no role check).
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(
+        profile.folded(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'},
+    )
@@ -1,7 +1,26 @@
 from fastapi import APIRouter
 
+from ...core.admission import upload_admission
+from ...core.cache import shared_cache
+from ...core.circuit_breaker import qwen_breakers
+from ...core.hedging import qwen_hedger
+
 router = APIRouter()
 
 @router.get("/health")
 def health():
-    return {"status": "ok"}
+    """Reports "degraded" while a model circuit is open or probing; the API still serves."""
+    return {
+        "status": "degraded" if qwen_breakers.any_open() else "ok",
+        "circuits": {name: stats["state"] for name, stats in qwen_breakers.stats().items()},
+    }
+
+@router.get("/metrics")
+def metrics():
+    """Queue depth, rejection, cache, hedging and circuit breaker counters for capacity monitoring."""
+    return {
+        "admission": upload_admission.stats(),
+        "shared_cache": shared_cache.stats(),
+        "qwen_hedging": qwen_hedger.stats(),
+        "circuit_breakers": qwen_breakers.stats(),
+    }
@@ -1,24 +1,47 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 import os
 import tempfile
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Literal, Optional
 
+from ...core.profiling import stage
+from ...dependencies.database import get_db
 from ...services.ai_service import extract_fields_from_document
 from ...services.pdf_form_service import get_pdf_form_fields, fill_pdf_form, validate_and_prepare_field_data
 from ...services.pdf_mapping_service import map_extracted_data_to_form_fields
+from ...services.fill_session_service import fill_session_store, FillSession, FillSessionStoreError
+from ...services.validation_service import validate_extracted_fields
+from ...services.document_dedup_service import extract_fields_with_dedup
+from ...services.packet_service import fill_form_packet, package_packet
+from ...services.profile_service import get_profile, profile_fields, fields_needing_extraction
 
 router = APIRouter()
 
 
+def _extraction_failed(extracted_data: Dict[str, Any]) -> HTTPException:
+    """503 with Retry-After while the model's circuit is open, otherwise 500."""
+    if "retry_after" in extracted_data:
+        return HTTPException(
+            status_code=503,
+            detail=f"Extraction unavailable: {extracted_data['error']}",
+            headers={"Retry-After": str(extracted_data["retry_after"])},
+        )
+    return HTTPException(status_code=500, detail=f"Extraction failed: {extracted_data['error']}")
+
+
 class TestExtractRequest(BaseModel):
     test_file: str  # Name of test file in test_data directory
 
 
 @router.post("/test/extract-upload")
-async def test_extract_upload(file: UploadFile = File(...)):
+async def test_extract_upload(
+    file: UploadFile = File(...),
+    user_id: Optional[int] = Query(None, description="Uploader; enables near-duplicate reuse")
+):
     """
     Test endpoint: Upload an image and extract fields using Qwen VL.
     """
@@ -30,16 +53,30 @@ async def test_extract_upload(file: UploadFile = File(...)):
             tmp_file.write(content)
             tmp_path = tmp_file.name
         
-        # Extract fields
-        fields = await extract_fields_from_document(tmp_path)
+        # Extract fields (reused if this user sent a near-identical image before)
+        fields, dedup = await extract_fields_with_dedup(tmp_path, content, user_id)
         
         # Clean up temp file
         os.unlink(tmp_path)
         
+        if "retry_after" in fields:
+            raise _extraction_failed(fields)
+        if "error" in fields:
+            return {
+                "filename": file.filename,
+                "extracted_fields": fields
+            }
+        
+        validation = await validate_extracted_fields(fields)
+        
         return {
             "filename": file.filename,
-            "extracted_fields": fields
+            "extracted_fields": validation["fields"],
+            "validation_issues": validation["issues"],
+            "reused_extraction": dedup["reused"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
 
@@ -102,6 +139,33 @@ class ManualFillRequest(BaseModel):
     manual_fields: Dict[str, Any]
 
 
+class SessionFillRequest(BaseModel):
+    fields: Dict[str, Any]  # Only changed or missing fields; None/"" clears a field
+
+
+async def _load_session(session_id: str) -> FillSession:
+    try:
+        session = await fill_session_store.get(session_id)
+    except FillSessionStoreError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if session is None:
+        raise HTTPException(status_code=404, detail="Fill session not found or expired")
+    return session
+
+
+def _session_state(session: FillSession) -> Dict[str, Any]:
+    # Profile values stay server-side; the caller only learns which fields they filled
+    return {
+        "session_id": session.id,
+        "filled_fields": {
+            name: value for name, value in session.filled_fields.items() if name not in session.profile_fields
+        },
+        "profile_filled_fields": session.profile_fields,
+        "missing_fields": session.missing_fields,
+        "expires_at": session.expires_at,
+    }
+
+
 @router.post("/test/pdf/get-fields")
 async def get_pdf_fields(payload: AutoFillRequest):
     """
@@ -115,7 +179,7 @@ async def get_pdf_fields(payload: AutoFillRequest):
         raise HTTPException(status_code=404, detail=f"PDF form not found: {payload.pdf_form_name}")
     
     try:
-        fields = get_pdf_form_fields(str(pdf_path))
+        fields = await asyncio.to_thread(get_pdf_form_fields, str(pdf_path))
         return {"fields": fields, "pdf_form": payload.pdf_form_name}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -124,48 +188,95 @@ async def get_pdf_fields(payload: AutoFillRequest):
 @router.post("/test/pdf/auto-fill")
 async def auto_fill_pdf(
     pdf_form: UploadFile = File(..., description="PDF form template"),
-    document: UploadFile = File(..., description="Document image to extract data from")
+    document: Optional[UploadFile] = File(None, description="Document image; optional once the user has a profile"),
+    user_id: Optional[int] = Query(None, description="Uploader; fills from their profile and enables near-duplicate reuse"),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Auto-fill a PDF form by:
-    1. Extracting data from uploaded document image
-    2. Getting PDF form fields
+    1. Filling what the resident's confirmed profile covers (when user_id has one)
+    2. Extracting data from the uploaded document image, only for form
+       fields the profile lacks
     3. Using AI to map extracted data to form fields
     4. Filling the PDF
     5. Returning filled PDF + missing fields for manual input
+    
+    user_id is not authenticated, so profile values are never returned: the
+    response lists the form fields filled from the profile by name only
+    (profile_filled_fields); extracted_data, mappings and filled_fields
+    cover the uploaded document alone.
     """
     try:
-        # Save uploaded files temporarily
+        profile = await get_profile(db, user_id) if user_id is not None else None
+        if profile is None and document is None:
+            raise HTTPException(status_code=400, detail="Upload a document; this user has no confirmed profile yet")
+        
+        # Save uploaded form temporarily
         pdf_suffix = Path(pdf_form.filename or "form.pdf").suffix
-        doc_suffix = Path(document.filename or "doc.jpg").suffix
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=pdf_suffix) as pdf_tmp:
-            pdf_content = await pdf_form.read()
-            pdf_tmp.write(pdf_content)
-            pdf_tmp_path = pdf_tmp.name
+        async with stage("upload_save"):
+            with tempfile.NamedTemporaryFile(delete=False, suffix=pdf_suffix) as pdf_tmp:
+                pdf_content = await pdf_form.read()
+                pdf_tmp.write(pdf_content)
+                pdf_tmp_path = pdf_tmp.name
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=doc_suffix) as doc_tmp:
-            doc_content = await document.read()
-            doc_tmp.write(doc_content)
-            doc_tmp_path = doc_tmp.name
+        # Step 1: Get PDF form fields and fill what the profile covers
+        form_fields = await asyncio.to_thread(get_pdf_form_fields, pdf_tmp_path)
         
-        # Step 1: Extract data from document
-        extracted_data = await extract_fields_from_document(doc_tmp_path)
+        known = profile_fields(profile) if profile is not None else {}
+        filled_fields: Dict[str, Any] = {}
+        mappings: List[Dict[str, Any]] = []
+        missing_fields = list(form_fields)
+        if known:
+            async with stage("profile_mapping"):
+                profile_result = await map_extracted_data_to_form_fields(known, form_fields)
+            filled_fields = dict(profile_result.get("filled_fields", {}))
+            mappings = list(profile_result.get("mappings", []))
+            missing_fields = profile_result.get("missing_fields", [])
+        profile_filled = sorted(filled_fields)
         
-        if "error" in extracted_data:
-            os.unlink(pdf_tmp_path)
+        # Step 2: Extract from the document only what is still needed
+        to_extract = fields_needing_extraction(missing_fields) if known else missing_fields
+        extracted_data = dict(known)
+        document_fields: Dict[str, Any] = {}
+        document_filled: Dict[str, Any] = {}
+        document_mappings: List[Dict[str, Any]] = []
+        validation_issues: Dict[str, str] = {}
+        dedup = {"reused": False}
+        extracted = False
+        if document is not None and to_extract:
+            doc_suffix = Path(document.filename or "doc.jpg").suffix
+            with tempfile.NamedTemporaryFile(delete=False, suffix=doc_suffix) as doc_tmp:
+                doc_content = await document.read()
+                doc_tmp.write(doc_content)
+                doc_tmp_path = doc_tmp.name
+            
+            async with stage("extraction"):
+                document_data, dedup = await extract_fields_with_dedup(doc_tmp_path, doc_content, user_id)
             os.unlink(doc_tmp_path)
-            raise HTTPException(status_code=500, detail=f"Extraction failed: {extracted_data['error']}")
-        
-        # Step 2: Get PDF form fields
-        form_fields = get_pdf_form_fields(pdf_tmp_path)
-        
-        # Step 3: Use AI to map extracted data to form fields
-        mapping_result = await map_extracted_data_to_form_fields(extracted_data, form_fields)
-        
-        filled_fields = mapping_result.get("filled_fields", {})
-        missing_fields = mapping_result.get("missing_fields", [])
-        mappings = mapping_result.get("mappings", [])
+            
+            if "error" in document_data:
+                os.unlink(pdf_tmp_path)
+                raise _extraction_failed(document_data)
+            
+            # Normalise locally; only low-confidence fields go back to the LLM
+            async with stage("validation"):
+                validation = await validate_extracted_fields(document_data)
+            validation_issues = validation["issues"]
+            
+            # Step 3: Use AI to map extracted data to the remaining form fields
+            async with stage("mapping"):
+                mapping_result = await map_extracted_data_to_form_fields(validation["fields"], to_extract)
+            
+            document_fields = validation["fields"]
+            document_filled = mapping_result.get("filled_fields", {})
+            document_mappings = mapping_result.get("mappings", [])
+            filled_fields.update(document_filled)
+            mappings.extend(document_mappings)
+            missing_fields = [f for f in missing_fields if f not in document_filled]
+            # Confirmed profile values win over a fresh extraction
+            extracted_data = {**document_fields, **known}
+            extracted = True
         
         # Step 4: Fill PDF (with whatever data we have)
         valid_data, _ = validate_and_prepare_field_data(filled_fields, form_fields)
@@ -174,24 +285,145 @@ async def auto_fill_pdf(
         
         # Clean up temp files
         os.unlink(pdf_tmp_path)
-        os.unlink(doc_tmp_path)
+        
+        # Keep the result server-side so corrections only send a delta
+        session = await fill_session_store.create(
+            template_pdf=pdf_content,
+            form_fields=form_fields,
+            extracted_data=extracted_data,
+            mappings=mappings,
+            filled_fields=valid_data,
+            filled_pdf=Path(output_pdf_path).read_bytes(),
+            profile_fields=profile_filled,
+        )
         
         # Return result with filled PDF path (stored temporarily)
         return {
+            "session_id": session.id,
             "filled_pdf_path": output_pdf_path,
-            "extracted_data": extracted_data,
-            "mappings": mappings,
-            "filled_fields": filled_fields,
+            "extracted_data": document_fields,
+            "used_profile": bool(known),
+            "profile_filled_fields": profile_filled,
+            "extracted_document": extracted,
+            "reused_extraction": dedup["reused"],
+            "validation_issues": validation_issues,
+            "mappings": document_mappings,
+            "filled_fields": document_filled,
             "missing_fields": missing_fields,
             "message": f"PDF filled with {len(filled_fields)} fields. {len(missing_fields)} fields need manual input."
         }
         
     except HTTPException:
         raise
+    except FillSessionStoreError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Auto-fill failed: {str(e)}")
 
 
+@router.post("/test/pdf/packet")
+async def fill_pdf_packet(
+    document: UploadFile = File(..., description="Document image to extract data from"),
+    form_names: List[str] = Form(default=[], description="PDF forms in test_data to include"),
+    pdf_forms: List[UploadFile] = File(default=[], description="Additional PDF form templates"),
+    output_format: Literal["pdf", "zip"] = Form("zip", description="One merged PDF or a ZIP of PDFs"),
+    user_id: Optional[int] = Query(None, description="Uploader; enables near-duplicate reuse")
+):
+    """
+    Fill several PDF forms from one document:
+    1. Extract data from the document once
+    2. Map it onto every form concurrently
+    3. Fill the forms in parallel
+    4. Return a merged PDF or ZIP (download via /test/pdf/download) + missing fields per form
+    Each form also gets a fill session for follow-up corrections.
+    """
+    backend_root = Path(__file__).parent.parent.parent.parent
+    test_data_dir = backend_root / "test_data"
+    
+    # Forms are keyed (and named in the ZIP) by name, so a repeat would silently replace the earlier form
+    templates: Dict[str, bytes] = {}
+    for name in form_names:
+        if name in templates:
+            raise HTTPException(status_code=400, detail=f"Form listed more than once: {name}")
+        pdf_path = test_data_dir / Path(name).name
+        if not pdf_path.exists():
+            raise HTTPException(status_code=404, detail=f"PDF form not found: {name}")
+        templates[name] = pdf_path.read_bytes()
+    for pdf_form in pdf_forms:
+        name = pdf_form.filename
+        if not name:
+            number = len(templates) + 1
+            while f"form_{number}.pdf" in templates:
+                number += 1
+            name = f"form_{number}.pdf"
+        elif name in templates:
+            raise HTTPException(status_code=400, detail=f"Form listed more than once: {name}")
+        templates[name] = await pdf_form.read()
+    if not templates:
+        raise HTTPException(status_code=400, detail="Provide at least one form in form_names or pdf_forms")
+    
+    try:
+        doc_suffix = Path(document.filename or "doc.jpg").suffix
+        with tempfile.NamedTemporaryFile(delete=False, suffix=doc_suffix) as doc_tmp:
+            doc_content = await document.read()
+            doc_tmp.write(doc_content)
+            doc_tmp_path = doc_tmp.name
+        
+        # Step 1: Extract once for the whole packet
+        extracted_data, dedup = await extract_fields_with_dedup(doc_tmp_path, doc_content, user_id)
+        os.unlink(doc_tmp_path)
+        
+        if "error" in extracted_data:
+            raise _extraction_failed(extracted_data)
+        
+        validation = await validate_extracted_fields(extracted_data)
+        extracted_data = validation["fields"]
+        
+        # Steps 2-3: Map and fill every form concurrently
+        results = await fill_form_packet(extracted_data, templates)
+        
+        # Step 4: Bundle
+        packet = await asyncio.to_thread(package_packet, results, output_format)
+        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{output_format}") as packet_tmp:
+            packet_tmp.write(packet)
+            packet_path = packet_tmp.name
+        
+        forms = []
+        for result in results:
+            session = await fill_session_store.create(
+                template_pdf=templates[result["form"]],
+                form_fields=result["form_fields"],
+                extracted_data=extracted_data,
+                mappings=result["mappings"],
+                filled_fields=result["filled_fields"],
+                filled_pdf=result["filled_pdf"],
+            )
+            forms.append({
+                "form": result["form"],
+                "session_id": session.id,
+                "filled_fields": result["filled_fields"],
+                "missing_fields": result["missing_fields"],
+            })
+        
+        return {
+            "packet_path": packet_path,
+            "format": output_format,
+            "extracted_data": extracted_data,
+            "reused_extraction": dedup["reused"],
+            "validation_issues": validation["issues"],
+            "forms": forms,
+            "message": f"Filled {len(forms)} forms. "
+                       f"{sum(len(f['missing_fields']) for f in forms)} fields need manual input."
+        }
+        
+    except HTTPException:
+        raise
+    except FillSessionStoreError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Packet fill failed: {str(e)}")
+
+
 @router.post("/test/pdf/complete-fill")
 async def complete_pdf_fill(payload: ManualFillRequest):
     """
@@ -219,6 +451,64 @@ async def complete_pdf_fill(payload: ManualFillRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/test/pdf/sessions/{session_id}")
+async def get_fill_session(session_id: str):
+    """
+    Get the current state of a fill session created by auto-fill.
+    """
+    session = await _load_session(session_id)
+    
+    return _session_state(session)
+
+
+@router.patch("/test/pdf/sessions/{session_id}")
+async def update_fill_session(session_id: str, payload: SessionFillRequest):
+    """
+    Apply corrections to a fill session.
+    Send only changed or missing fields; the server keeps the rest.
+    """
+    try:
+        session = await fill_session_store.apply_delta(session_id, payload.fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FillSessionStoreError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    if session is None:
+        raise HTTPException(status_code=404, detail="Fill session not found or expired")
+    
+    return _session_state(session)
+
+
+@router.get("/test/pdf/sessions/{session_id}/download")
+async def download_fill_session(session_id: str):
+    """
+    Download the current filled PDF of a fill session.
+    """
+    session = await _load_session(session_id)
+    
+    return Response(
+        content=session.filled_pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": 'attachment; filename="filled_form.pdf"'},
+    )
+
+
+@router.delete("/test/pdf/sessions/{session_id}")
+async def delete_fill_session(session_id: str):
+    """
+    Discard a fill session once the resident is done with it.
+    """
+    try:
+        deleted = await fill_session_store.delete(session_id)
+    except FillSessionStoreError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Fill session not found or expired")
+    
+    return {"message": "Fill session deleted"}
+
+
 @router.get("/test/pdf/download/{temp_filename}")
 async def download_filled_pdf(temp_filename: str):
     """
@@ -231,6 +521,9 @@ async def download_filled_pdf(temp_filename: str):
     if not file_path.exists() or not file_path.is_file():
         raise HTTPException(status_code=404, detail="File not found")
     
+    if file_path.suffix == ".zip":
+        return FileResponse(str(file_path), media_type="application/zip", filename="filled_forms.zip")
+    
     return FileResponse(
         str(file_path),
         media_type="application/pdf",
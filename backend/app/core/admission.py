@@ -0,0 +1,229 @@
+import asyncio
+import ipaddress
+import json
+import math
+import time
+from collections import deque
+from typing import Dict, Any, Iterable, List, Optional, Union
+
+from .config import settings
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Caps concurrent work on expensive endpoints.
+
+    At most max_concurrent requests run at once and each user may hold at
+    most max_per_user slots (running or queued). Requests beyond the global
+    cap wait FIFO in a queue of at most max_queue for up to queue_timeout
+    seconds. Anything that cannot be admitted is rejected immediately:
+    429 for a user over their cap, 503 when the queue is full or the wait
+    times out, both with a Retry-After estimate.
+    """
+
+    def __init__(self, max_concurrent: int, max_per_user: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._per_user: Dict[str, int] = {}
+        self._waiters: deque = deque()
+        self._service_time = 5.0  # EWMA of seconds per admitted request
+        self.counters = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_user_limit": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+        }
+
+    def retry_after(self) -> int:
+        waves = (len(self._waiters) + 1) / max(1, self.max_concurrent)
+        return max(1, math.ceil(waves * self._service_time))
+
+    async def acquire(self, user_key: str) -> None:
+        """Wait for a slot or raise AdmissionRejected."""
+        if self._per_user.get(user_key, 0) >= self.max_per_user:
+            self.counters["rejected_user_limit"] += 1
+            raise AdmissionRejected(429, "Too many concurrent requests for this user", self.retry_after())
+
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self._admit(user_key)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.counters["rejected_queue_full"] += 1
+            raise AdmissionRejected(503, "Server is busy", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._per_user[user_key] = self._per_user.get(user_key, 0) + 1
+        self.counters["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            self._drop_waiter(waiter, user_key)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.counters["rejected_queue_timeout"] += 1
+            raise AdmissionRejected(503, "Server is busy", self.retry_after())
+        # release() already moved the slot to us
+        self.counters["admitted"] += 1
+
+    def _admit(self, user_key: str) -> None:
+        self.in_flight += 1
+        self._per_user[user_key] = self._per_user.get(user_key, 0) + 1
+        self.counters["admitted"] += 1
+
+    def _drop_waiter(self, waiter: asyncio.Future, user_key: str) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # Granted at the same moment we gave up: hand the slot on
+            self.release(user_key, None)
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._decrement_user(user_key)
+
+    def release(self, user_key: str, service_time: Optional[float]) -> None:
+        if service_time is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * service_time
+        self._decrement_user(user_key)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Slot passes straight to the next waiter; in_flight is unchanged
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _decrement_user(self, user_key: str) -> None:
+        remaining = self._per_user.get(user_key, 0) - 1
+        if remaining > 0:
+            self._per_user[user_key] = remaining
+        else:
+            self._per_user.pop(user_key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "avg_service_seconds": round(self._service_time, 3),
+            **self.counters,
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that gates POSTs to the given paths through an
+    AdmissionController before the request body is read, so rejected
+    uploads are never buffered.
+
+    Callers are keyed by client address. The app has no authenticated
+    identity to key on (user_id is a query parameter the caller chooses,
+    so keying on it would let anyone dodge the per-user cap). When the
+    peer is one of trusted_proxies, the client is the rightmost
+    X-Forwarded-For entry that is not itself a trusted proxy; otherwise
+    the header is ignored, since a direct caller could forge it.
+    """
+
+    def __init__(self, app, controller: AdmissionController, paths: Iterable[str],
+                 trusted_proxies: str = ""):
+        self.app = app
+        self.controller = controller
+        self.paths = set(paths)
+        self.trusted_proxies = parse_networks(trusted_proxies)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        user_key = _client_key(scope, self.trusted_proxies)
+        try:
+            await self.controller.acquire(user_key)
+        except AdmissionRejected as e:
+            await _send_rejection(send, e)
+            return
+
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(user_key, time.monotonic() - start)
+
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_networks(spec: str) -> List[Network]:
+    """"10.0.0.1, 172.16.0.0/12" -> networks. Raises ValueError on a bad entry."""
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in spec.split(",") if part.strip()]
+
+
+def _is_trusted(address: str, networks: List[Network]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def _client_key(scope, trusted_proxies: List[Network]) -> str:
+    client = scope.get("client")
+    address = client[0] if client else None
+    if address is not None and _is_trusted(address, trusted_proxies):
+        forwarded = [
+            hop.strip()
+            for name, value in scope.get("headers", [])
+            if name == b"x-forwarded-for"
+            for hop in value.decode("latin-1").split(",")
+            if hop.strip()
+        ]
+        for hop in reversed(forwarded):
+            address = hop
+            if not _is_trusted(hop, trusted_proxies):
+                break
+    return f"addr:{address}" if address else "anonymous"
+
+
+async def _send_rejection(send, rejection: AdmissionRejected) -> None:
+    body = json.dumps({"detail": rejection.reason}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": rejection.status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(rejection.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# Shared by every endpoint that runs a VL extraction
+upload_admission = AdmissionController(
+    max_concurrent=settings.ADMISSION_MAX_CONCURRENT,
+    max_per_user=settings.ADMISSION_MAX_PER_USER,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+)
+
+ADMISSION_PATHS = (
+    "/api/v1/test/extract-upload",
+    "/api/v1/test/pdf/auto-fill",
+    "/api/v1/test/pdf/packet",
+)
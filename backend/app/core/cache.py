@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Refresh an entry's access time at most this often, so hot reads don't
+# turn into a write each.
+TOUCH_INTERVAL_SECONDS = 60
+# Check the size bound every this many writes
+EVICT_EVERY_WRITES = 50
+
+
+def make_key(*parts: Any) -> str:
+    """Stable cache key from bytes / str / JSON-serialisable parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            data = part
+        elif isinstance(part, str):
+            data = part.encode("utf-8")
+        else:
+            data = json.dumps(part, sort_keys=True, default=str).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class SharedCache:
+    """
+    Node-local cache shared by every uvicorn worker, backed by one SQLite
+    file in WAL mode.
+
+    Writes are single transactions, so readers in other processes never
+    see a half-written entry. Entries expire after their TTL; when the
+    file's payload exceeds max_bytes the least recently used entries are
+    evicted. The file survives restarts. Any SQLite error is logged and
+    treated as a miss, so the cache can never fail a request.
+
+    The sqlite3 calls block (up to the 5 s busy timeout under write
+    contention), so async code uses aget/aset/adelete, which run them in
+    a worker thread; get/set/delete are for code already off the loop.
+    """
+
+    def __init__(self, path: str, max_bytes: int, default_ttl: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (accessed_at)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return the cached JSON value, or None on miss/expiry/error."""
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+            if now - row[2] > TOUCH_INTERVAL_SECONDS:
+                conn.execute(
+                    "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, namespace, key),
+                )
+            self.hits += 1
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning("shared cache read failed: %s", e)
+            self.misses += 1
+            return None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        payload = json.dumps(value).encode("utf-8")
+        if len(payload) > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, size, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, payload, len(payload), now + (ttl or self.default_ttl), now),
+            )
+            self._writes += 1
+            if self._writes % EVICT_EVERY_WRITES == 0:
+                self.evict()
+        except sqlite3.Error as e:
+            logger.warning("shared cache write failed: %s", e)
+
+    def delete(self, namespace: str, key: str) -> None:
+        try:
+            self._connection().execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+            )
+        except sqlite3.Error as e:
+            logger.warning("shared cache delete failed: %s", e)
+
+    async def aget(self, namespace: str, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get, namespace, key)
+
+    async def aset(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        await asyncio.to_thread(self.set, namespace, key, value, ttl)
+
+    async def adelete(self, namespace: str, key: str) -> None:
+        await asyncio.to_thread(self.delete, namespace, key)
+
+    def evict(self) -> None:
+        """Drop expired entries, then least recently used ones down to 90% of max_bytes."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+            if total > self.max_bytes:
+                target = int(self.max_bytes * 0.9)
+                freed = 0
+                doomed = []
+                for namespace, key, size in conn.execute(
+                    "SELECT namespace, key, size FROM cache_entries ORDER BY accessed_at"
+                ):
+                    if total - freed <= target:
+                        break
+                    doomed.append((namespace, key))
+                    freed += size
+                conn.executemany("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", doomed)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> dict:
+        try:
+            count, total = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+            ).fetchone()
+        except sqlite3.Error:
+            count, total = None, None
+        return {"entries": count, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+
+class NullCache:
+    """Used when SHARED_CACHE_ENABLED is false: every read misses."""
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        return None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        pass
+
+    def delete(self, namespace: str, key: str) -> None:
+        pass
+
+    async def aget(self, namespace: str, key: str) -> Optional[Any]:
+        return None
+
+    async def aset(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        pass
+
+    async def adelete(self, namespace: str, key: str) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"enabled": False}
+
+
+def prepare_cache_file(path: str) -> None:
+    """
+    Make sure the cache file lives in a private directory and is private
+    itself. The cache holds extracted personal data, so it is refused
+    under the system temp dir (predictable, shared, and served by the
+    PDF download endpoint) and must not be a symlink.
+
+    Raises ValueError (bad location) or OSError (cannot secure it).
+    """
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    temp_dir = os.path.realpath(tempfile.gettempdir())
+    if os.path.commonpath([os.path.realpath(directory), temp_dir]) == temp_dir:
+        raise ValueError(f"{path} is under the system temp dir")
+
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    os.chmod(directory, 0o700)
+    # O_NOFOLLOW: a pre-planted symlink fails here instead of being written through
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+    try:
+        info = os.fstat(fd)
+        if not stat.S_ISREG(info.st_mode) or info.st_uid != os.getuid():
+            raise ValueError(f"{path} is not a regular file owned by this user")
+        os.fchmod(fd, 0o600)
+    finally:
+        os.close(fd)
+
+
+def build_shared_cache():
+    """The shared cache from settings; NullCache if disabled or its file cannot be secured."""
+    if not settings.SHARED_CACHE_ENABLED:
+        return NullCache()
+    path = settings.SHARED_CACHE_PATH or os.path.join(settings.APP_DATA_DIR, "shared_cache.sqlite3")
+    try:
+        prepare_cache_file(path)
+    except (OSError, ValueError) as e:
+        logger.error("shared cache disabled: %s", e)
+        return NullCache()
+    return SharedCache(
+        path=path,
+        max_bytes=settings.SHARED_CACHE_MAX_BYTES,
+        default_ttl=settings.SHARED_CACHE_TTL_SECONDS,
+    )
+
+
+shared_cache = build_shared_cache()
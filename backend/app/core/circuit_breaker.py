@@ -0,0 +1,178 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from .config import settings
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} is temporarily unavailable")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream that is failing or too slow.
+
+    The outcome of the last `window` calls is kept. Once at least
+    min_calls are known, the circuit opens when the share of failures
+    reaches failure_rate or the share of calls slower than slow_call_seconds
+    reaches slow_call_rate. While open, calls fail immediately with
+    CircuitOpenError. After open_seconds it goes half-open and lets up to
+    half_open_probes calls through: if they all succeed the circuit
+    closes, and any failure opens it again.
+
+    Every state change starts a new generation, and each call is tagged
+    with the generation that admitted it. A call admitted before the
+    circuit opened can finish while it is half-open; its result is
+    counted in the totals but not as a probe or window outcome.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int,
+        min_calls: int,
+        failure_rate: float,
+        slow_call_seconds: float,
+        slow_call_rate: float,
+        open_seconds: float,
+        half_open_probes: int,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._outcomes: deque = deque(maxlen=window)  # (failed, slow)
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_passed = 0
+        self._generation = 0
+        self.counters = {"calls": 0, "failures": 0, "slow_calls": 0, "rejected": 0, "opened": 0, "stale_results": 0}
+
+    def _retry_after(self) -> int:
+        return max(1, round(self._opened_at + self.open_seconds - time.monotonic()))
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        self._generation += 1
+
+    def _before_call(self) -> int:
+        """Admit a call (or raise CircuitOpenError); returns its generation."""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(self.name, self._retry_after())
+            self._transition(HALF_OPEN)
+            self._probes_started = 0
+            self._probes_passed = 0
+        if self.state == HALF_OPEN:
+            if self._probes_started >= self.half_open_probes:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(self.name, 1)
+            self._probes_started += 1
+        return self._generation
+
+    def _open(self) -> None:
+        self._transition(OPEN)
+        self._opened_at = time.monotonic()
+        self.counters["opened"] += 1
+
+    def _after_call(self, generation: int, failed: bool, duration: float) -> None:
+        slow = duration >= self.slow_call_seconds
+        self.counters["calls"] += 1
+        self.counters["failures"] += failed
+        self.counters["slow_calls"] += slow
+        if generation != self._generation:
+            # Admitted under an earlier state: says nothing about this one
+            self.counters["stale_results"] += 1
+            return
+
+        if self.state == HALF_OPEN:
+            if failed or slow:
+                self._open()
+                return
+            self._probes_passed += 1
+            if self._probes_passed >= self.half_open_probes:
+                self._transition(CLOSED)
+                self._outcomes.clear()
+            return
+
+        self._outcomes.append((failed, slow))
+        if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+            total = len(self._outcomes)
+            failures = sum(1 for f, _ in self._outcomes if f)
+            slow_calls = sum(1 for _, s in self._outcomes if s)
+            if failures / total >= self.failure_rate or slow_calls / total >= self.slow_call_rate:
+                self._open()
+
+    async def call(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Run attempt() through the breaker; any exception counts as a failure."""
+        generation = self._before_call()
+        start = time.monotonic()
+        try:
+            result = await attempt()
+        except asyncio.CancelledError:
+            # Cancellation says nothing about upstream health; give the probe back
+            if self.state == HALF_OPEN and generation == self._generation:
+                self._probes_started -= 1
+            raise
+        except Exception:
+            self._after_call(generation, True, time.monotonic() - start)
+            raise
+        self._after_call(generation, False, time.monotonic() - start)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        total = len(self._outcomes)
+        return {
+            "state": self.state,
+            "retry_after": self._retry_after() if self.state == OPEN else None,
+            "window_calls": total,
+            "window_failure_rate": round(sum(1 for f, _ in self._outcomes if f) / total, 3) if total else 0.0,
+            "window_slow_rate": round(sum(1 for _, s in self._outcomes if s) / total, 3) if total else 0.0,
+            **self.counters,
+        }
+
+
+class CircuitBreakerRegistry:
+    """One breaker per upstream model, created on first use with shared settings."""
+
+    def __init__(self, **config):
+        self.config = config
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        if name not in self._breakers:
+            self._breakers[name] = CircuitBreaker(name=name, **self.config)
+        return self._breakers[name]
+
+    def any_open(self) -> bool:
+        return any(b.state != CLOSED for b in self._breakers.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: breaker.stats() for name, breaker in self._breakers.items()}
+
+
+qwen_breakers = CircuitBreakerRegistry(
+    window=settings.QWEN_BREAKER_WINDOW,
+    min_calls=settings.QWEN_BREAKER_MIN_CALLS,
+    failure_rate=settings.QWEN_BREAKER_FAILURE_RATE,
+    slow_call_seconds=settings.QWEN_BREAKER_SLOW_CALL_SECONDS,
+    slow_call_rate=settings.QWEN_BREAKER_SLOW_CALL_RATE,
+    open_seconds=settings.QWEN_BREAKER_OPEN_SECONDS,
+    half_open_probes=settings.QWEN_BREAKER_HALF_OPEN_PROBES,
+)
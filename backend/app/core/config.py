@@ -1,4 +1,5 @@
 import os
+from pathlib import Path
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -21,5 +22,73 @@ class Settings(BaseSettings):
     # Qwen model API endpoint
     QWEN_API_KEY: str = os.getenv("QWEN_API_KEY", "")
     QWEN_API_ENDPOINT: str = os.getenv("QWEN_API_ENDPOINT", "")
+    QWEN_TIMEOUT_SECONDS: float = float(os.getenv("QWEN_TIMEOUT_SECONDS", "60"))
+    # Server-side fill sessions (auto-fill -> correction rounds); own budget, never evicted before the TTL
+    FILL_SESSION_TTL_SECONDS: int = int(os.getenv("FILL_SESSION_TTL_SECONDS", "1800"))
+    FILL_SESSION_MAX_COUNT: int = int(os.getenv("FILL_SESSION_MAX_COUNT", "500"))
+    FILL_SESSION_MAX_BYTES: int = int(os.getenv("FILL_SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+    # Extracted-field validation: only fields below the threshold go to the LLM
+    VALIDATION_LLM_REVIEW: bool = os.getenv("VALIDATION_LLM_REVIEW", "true").lower() == "true"
+    VALIDATION_REVIEW_THRESHOLD: float = float(os.getenv("VALIDATION_REVIEW_THRESHOLD", "0.6"))
+    # Field mapping strategy: "llm", "local" or "local_first"
+    FIELD_MAPPING_MODE: str = os.getenv("FIELD_MAPPING_MODE", "local_first")
+    # Near-duplicate upload detection: 63-bit DCT pHash shortlist (Hamming distance),
+    # confirmed by match_score; calibrate both with scripts/calibrate_dedup.py
+    PHASH_MAX_DISTANCE: int = int(os.getenv("PHASH_MAX_DISTANCE", "24"))
+    PHASH_MIN_MATCH_SCORE: float = float(os.getenv("PHASH_MIN_MATCH_SCORE", "0.75"))
+    PHASH_CONFIRM_CANDIDATES: int = int(os.getenv("PHASH_CONFIRM_CANDIDATES", "3"))
+    # Every processed upload, shared by the workers (SQLite file, created 0600; ":memory:" = per worker)
+    PHASH_INDEX_PATH: str = os.getenv("PHASH_INDEX_PATH", "")
+    PHASH_FLAG_LIMIT: int = int(os.getenv("PHASH_FLAG_LIMIT", "1000"))
+    # App-owned directory for local state (created 0700); never the system temp dir
+    APP_DATA_DIR: str = os.getenv("APP_DATA_DIR") or str(Path(__file__).resolve().parents[2] / "data")
+    # Node-local cache shared by all workers (SQLite WAL file, created 0600)
+    SHARED_CACHE_ENABLED: bool = os.getenv("SHARED_CACHE_ENABLED", "true").lower() == "true"
+    SHARED_CACHE_PATH: str = os.getenv("SHARED_CACHE_PATH", "")
+    SHARED_CACHE_MAX_BYTES: int = int(os.getenv("SHARED_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    SHARED_CACHE_TTL_SECONDS: int = int(os.getenv("SHARED_CACHE_TTL_SECONDS", "86400"))
+    # Admission control for extraction endpoints (per worker)
+    ADMISSION_MAX_CONCURRENT: int = int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+    ADMISSION_MAX_PER_USER: int = int(os.getenv("ADMISSION_MAX_PER_USER", "2"))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10"))
+    # Reverse proxies (IPs/CIDRs, comma-separated) whose X-Forwarded-For names the client;
+    # empty = the app is reached directly and the peer address is the client
+    ADMISSION_TRUSTED_PROXIES: str = os.getenv("ADMISSION_TRUSTED_PROXIES", "")
+    # Bulk resident import (0 = one password-hashing thread per CPU)
+    BULK_IMPORT_HASH_WORKERS: int = int(os.getenv("BULK_IMPORT_HASH_WORKERS", "0"))
+    BULK_IMPORT_BATCH_SIZE: int = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "500"))
+    # Notification outbox dispatcher; sink is "console" or "file"
+    NOTIFICATION_DISPATCHER_ENABLED: bool = os.getenv("NOTIFICATION_DISPATCHER_ENABLED", "true").lower() == "true"
+    NOTIFICATION_SINK: str = os.getenv("NOTIFICATION_SINK", "console")
+    NOTIFICATION_SINK_PATH: str = os.getenv("NOTIFICATION_SINK_PATH", "notifications.jsonl")
+    NOTIFICATION_BATCH_SIZE: int = int(os.getenv("NOTIFICATION_BATCH_SIZE", "100"))
+    NOTIFICATION_POLL_SECONDS: float = float(os.getenv("NOTIFICATION_POLL_SECONDS", "2"))
+    NOTIFICATION_MAX_ATTEMPTS: int = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+    NOTIFICATION_RETRY_BASE_SECONDS: float = float(os.getenv("NOTIFICATION_RETRY_BASE_SECONDS", "30"))
+    # Hedged Qwen requests: duplicate a call still running past this latency percentile
+    QWEN_HEDGING_ENABLED: bool = os.getenv("QWEN_HEDGING_ENABLED", "false").lower() == "true"
+    QWEN_HEDGE_PERCENTILE: float = float(os.getenv("QWEN_HEDGE_PERCENTILE", "95"))
+    QWEN_HEDGE_MIN_DELAY_SECONDS: float = float(os.getenv("QWEN_HEDGE_MIN_DELAY_SECONDS", "1"))
+    QWEN_HEDGE_BUDGET_RATIO: float = float(os.getenv("QWEN_HEDGE_BUDGET_RATIO", "0.05"))
+    QWEN_HEDGE_MAX_BURST: float = float(os.getenv("QWEN_HEDGE_MAX_BURST", "5"))
+    QWEN_HEDGE_MIN_SAMPLES: int = int(os.getenv("QWEN_HEDGE_MIN_SAMPLES", "20"))
+    # Circuit breaker per Qwen model: trips on failure or slow-call rate over the window
+    QWEN_BREAKER_WINDOW: int = int(os.getenv("QWEN_BREAKER_WINDOW", "20"))
+    QWEN_BREAKER_MIN_CALLS: int = int(os.getenv("QWEN_BREAKER_MIN_CALLS", "10"))
+    QWEN_BREAKER_FAILURE_RATE: float = float(os.getenv("QWEN_BREAKER_FAILURE_RATE", "0.5"))
+    QWEN_BREAKER_SLOW_CALL_SECONDS: float = float(os.getenv("QWEN_BREAKER_SLOW_CALL_SECONDS", "30"))
+    QWEN_BREAKER_SLOW_CALL_RATE: float = float(os.getenv("QWEN_BREAKER_SLOW_CALL_RATE", "0.8"))
+    QWEN_BREAKER_OPEN_SECONDS: float = float(os.getenv("QWEN_BREAKER_OPEN_SECONDS", "30"))
+    QWEN_BREAKER_HALF_OPEN_PROBES: int = int(os.getenv("QWEN_BREAKER_HALF_OPEN_PROBES", "2"))
+    # Document-type classifier index (scripts/build_doc_classifier.py); empty = generic prompt
+    DOC_CLASSIFIER_INDEX_PATH: str = os.getenv("DOC_CLASSIFIER_INDEX_PATH", "")
+    DOC_CLASSIFIER_MIN_CONFIDENCE: float = float(os.getenv("DOC_CLASSIFIER_MIN_CONFIDENCE", "0.6"))
+    # Request profiling: middleware is only installed when enabled
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_TOKEN: str = os.getenv("PROFILING_TOKEN", "")
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    PROFILING_INTERVAL_MS: float = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+    PROFILING_BUFFER_SIZE: int = int(os.getenv("PROFILING_BUFFER_SIZE", "50"))
 
 settings = Settings()
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from .config import settings
+
+T = TypeVar("T")
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class _KindStats:
+    def __init__(self, window: int):
+        self.attempt_latencies: deque = deque(maxlen=window)  # single-request latencies, drives the trigger
+        self.call_latencies: deque = deque(maxlen=window)     # what the caller waited, hedged or not
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+
+
+class Hedger:
+    """
+    Hedged requests for slow, idempotent model calls.
+
+    The first attempt runs alone until it has taken longer than the
+    trigger_percentile of recent single-attempt latencies for the same
+    kind of call. A duplicate is then started; the first attempt to return
+    a result accepted by is_valid wins and the other is cancelled.
+
+    Hedges draw from a token budget that earns budget_ratio tokens per
+    call (at most max_burst banked), so extra requests stay at roughly
+    budget_ratio of traffic even when the model slows down across the
+    board. No hedging happens until min_samples latencies are known.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        trigger_percentile: float,
+        min_delay: float,
+        budget_ratio: float,
+        max_burst: float,
+        min_samples: int,
+        window: int = 500,
+    ):
+        self.enabled = enabled
+        self.trigger_percentile = trigger_percentile
+        self.min_delay = min_delay
+        self.budget_ratio = budget_ratio
+        self.max_burst = max_burst
+        self.min_samples = min_samples
+        self.window = window
+        self._tokens = 0.0
+        self._kinds: Dict[str, _KindStats] = {}
+
+    def _stats(self, kind: str) -> _KindStats:
+        if kind not in self._kinds:
+            self._kinds[kind] = _KindStats(self.window)
+        return self._kinds[kind]
+
+    def hedge_delay(self, kind: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little data."""
+        latencies = self._stats(kind).attempt_latencies
+        if len(latencies) < self.min_samples:
+            return None
+        return max(self.min_delay, _percentile(sorted(latencies), self.trigger_percentile))
+
+    async def run(
+        self,
+        kind: str,
+        attempt: Callable[[], Awaitable[T]],
+        is_valid: Callable[[T], bool] = lambda result: True,
+    ) -> T:
+        """
+        Await attempt(), hedging it with a second attempt() if it is slow.
+
+        Returns the first valid result. If neither attempt produces one,
+        returns the last invalid result, or raises the first error.
+        """
+        stats = self._stats(kind)
+        stats.calls += 1
+        self._tokens = min(self.max_burst, self._tokens + self.budget_ratio)
+        start = time.monotonic()
+        try:
+            return await self._run(kind, stats, attempt, is_valid)
+        finally:
+            stats.call_latencies.append(time.monotonic() - start)
+
+    async def _run(self, kind: str, stats: _KindStats, attempt, is_valid):
+        primary = asyncio.ensure_future(self._timed(stats, attempt))
+        delay = self.hedge_delay(kind) if self.enabled else None
+        if delay is None:
+            return await primary
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            primary.cancel()  # asyncio.wait leaves it running
+            raise
+        if done:
+            return primary.result()
+        if self._tokens < 1:
+            stats.budget_denied += 1
+            return await primary
+
+        self._tokens -= 1
+        stats.hedged += 1
+        hedge = asyncio.ensure_future(self._timed(stats, attempt))
+        pending = {primary, hedge}
+        invalid, error = None, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    result = task.result()
+                    if is_valid(result):
+                        if task is hedge:
+                            stats.hedge_wins += 1
+                        return result
+                    invalid = result
+        finally:
+            for task in pending:
+                task.cancel()
+        if invalid is not None:
+            return invalid
+        raise error
+
+    @staticmethod
+    async def _timed(stats: _KindStats, attempt):
+        start = time.monotonic()
+        try:
+            return await attempt()
+        finally:
+            # A cancelled loser records its elapsed time as a lower bound,
+            # so hedging does not hide the tail from the trigger percentile
+            stats.attempt_latencies.append(time.monotonic() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        kinds = {}
+        for kind, s in self._kinds.items():
+            calls = sorted(s.call_latencies)
+            attempts = sorted(s.attempt_latencies)
+            kinds[kind] = {
+                "calls": s.calls,
+                "hedged": s.hedged,
+                "hedge_wins": s.hedge_wins,
+                "budget_denied": s.budget_denied,
+                "extra_request_ratio": round(s.hedged / s.calls, 4) if s.calls else 0.0,
+                "hedge_delay_ms": round(self.hedge_delay(kind) * 1000) if self.hedge_delay(kind) else None,
+                "call_p50_ms": round(_percentile(calls, 50) * 1000) if calls else None,
+                "call_p99_ms": round(_percentile(calls, 99) * 1000) if calls else None,
+                "attempt_p99_ms": round(_percentile(attempts, 99) * 1000) if attempts else None,
+            }
+        return {"enabled": self.enabled, "budget_tokens": round(self._tokens, 2), "kinds": kinds}
+
+
+qwen_hedger = Hedger(
+    enabled=settings.QWEN_HEDGING_ENABLED,
+    trigger_percentile=settings.QWEN_HEDGE_PERCENTILE,
+    min_delay=settings.QWEN_HEDGE_MIN_DELAY_SECONDS,
+    budget_ratio=settings.QWEN_HEDGE_BUDGET_RATIO,
+    max_burst=settings.QWEN_HEDGE_MAX_BURST,
+    min_samples=settings.QWEN_HEDGE_MIN_SAMPLES,
+)
@@ -0,0 +1,284 @@
+import contextvars
+import hmac
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional
+
+from .config import settings
+
+# Admin header that asks for a request to be profiled; value is PROFILING_TOKEN
+PROFILE_HEADER = b"x-profile"
+
+# Innermost frames of threads that are parked, not working; dropped from samples
+_IDLE_FRAMES = {("threading", "wait"), ("queue", "get"), ("concurrent.futures.thread", "_worker")}
+
+
+class RequestProfile:
+    """Stack samples and per-stage timings for one profiled request."""
+
+    def __init__(self, method: str, path: str, trigger: str, loop_thread: int, root_frame=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.started_at = time.time()
+        self.wall_ms = 0.0
+        self.status_code: Optional[int] = None
+        self.samples: Counter = Counter()
+        self.stages: List[Dict[str, Any]] = []
+        # The event-loop thread, and the request's outermost coroutine frame on it
+        self.loop_thread = loop_thread
+        self.root_frame = root_frame
+        # Threads currently inside a synchronous stage of this request -> nesting depth
+        self.threads: Counter = Counter()
+        self._threads_lock = threading.Lock()
+
+    def enter_thread(self) -> None:
+        with self._threads_lock:
+            self.threads[threading.get_ident()] += 1
+
+    def leave_thread(self) -> None:
+        ident = threading.get_ident()
+        with self._threads_lock:
+            self.threads[ident] -= 1
+            if self.threads[ident] <= 0:
+                del self.threads[ident]
+
+    def add_stage(self, name: str, wall: float, cpu: Optional[float]) -> None:
+        # list.append is atomic, so stages may finish in worker threads
+        self.stages.append({"name": name, "wall_ms": wall * 1000, "cpu_ms": None if cpu is None else cpu * 1000})
+
+    def stage_summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Wall milliseconds per stage name, plus CPU and blocked (wall - CPU)
+        milliseconds for synchronous stages. Async stages report wall time
+        only: the loop thread's CPU clock also runs for every other
+        coroutine scheduled while they await.
+        """
+        summary: Dict[str, Dict[str, Any]] = {}
+        for stage in self.stages:
+            entry = summary.setdefault(stage["name"], {"count": 0, "wall_ms": 0.0, "cpu_ms": 0.0})
+            entry["count"] += 1
+            entry["wall_ms"] += stage["wall_ms"]
+            if stage["cpu_ms"] is None or entry["cpu_ms"] is None:
+                entry["cpu_ms"] = None
+            else:
+                entry["cpu_ms"] += stage["cpu_ms"]
+        for entry in summary.values():
+            if entry["cpu_ms"] is None:
+                del entry["cpu_ms"]
+            else:
+                entry["blocked_ms"] = round(max(0.0, entry["wall_ms"] - entry["cpu_ms"]), 2)
+                entry["cpu_ms"] = round(entry["cpu_ms"], 2)
+            entry["wall_ms"] = round(entry["wall_ms"], 2)
+        return summary
+
+    def folded(self) -> str:
+        """Samples in Brendan Gregg's folded format (flamegraph.pl, speedscope)."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "started_at": self.started_at,
+            "wall_ms": round(self.wall_ms, 2),
+            "status_code": self.status_code,
+            "sample_count": sum(self.samples.values()),
+            "stages": self.stage_summary(),
+        }
+
+
+_current_profile: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+class stage:
+    """
+    Time a block as a named stage of the current profiled request.
+
+    Usable as `with stage("pdf_fill"):` or `async with stage("qwen_extraction"):`.
+    A synchronous stage, on the loop or in a worker thread, also records
+    its thread's CPU time, and its thread is sampled while it runs. An
+    async stage records wall time only, since other requests' coroutines
+    run on the same thread while it awaits; nest a `with stage(...)` for
+    the CPU-bound part. Outside a profiled request it does nothing beyond
+    one context-variable lookup.
+    """
+
+    __slots__ = ("name", "_profile", "_wall", "_cpu")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self._profile = _current_profile.get()
+        if self._profile is not None:
+            self._profile.enter_thread()
+            self._wall = time.perf_counter()
+            self._cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        if self._profile is not None:
+            self._profile.add_stage(
+                self.name, time.perf_counter() - self._wall, time.thread_time() - self._cpu
+            )
+            self._profile.leave_thread()
+        return False
+
+    async def __aenter__(self):
+        self._profile = _current_profile.get()
+        if self._profile is not None:
+            self._wall = time.perf_counter()
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._profile is not None:
+            self._profile.add_stage(self.name, time.perf_counter() - self._wall, None)
+        return False
+
+
+class StackSampler:
+    """
+    Samples Python stacks at a fixed interval on a daemon thread and folds
+    them into a RequestProfile. Only the request's own work is kept: the
+    loop thread while it runs the request's coroutine chain, and any
+    thread while it is inside one of the request's synchronous stages.
+    Other requests sharing the loop, tasks the request spawns and worker
+    threads outside a stage are not sampled.
+    """
+
+    def __init__(self, profile: RequestProfile, interval: float):
+        self.profile = profile
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident in self.profile.threads:
+                    stack = _fold(frame)
+                elif ident == self.profile.loop_thread:
+                    stack = _fold(frame, within=self.profile.root_frame)
+                else:
+                    continue
+                if stack is not None:
+                    self.profile.samples[f"{names.get(ident, ident)};{stack}"] += 1
+
+
+def _frame_label(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+def _fold(frame, within=None) -> Optional[str]:
+    """The stack as "outer;...;inner", or None if it is idle or does not pass through within."""
+    if (frame.f_globals.get("__name__"), frame.f_code.co_name) in _IDLE_FRAMES:
+        return None
+    labels = []
+    found = within is None
+    while frame is not None:
+        found = found or frame is within
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels)) if found else None
+
+
+class ProfileStore:
+    """Most recent profiles, oldest dropped first."""
+
+    def __init__(self, max_profiles: int):
+        self._profiles: deque = deque(maxlen=max_profiles)
+
+    def add(self, profile: RequestProfile) -> None:
+        self._profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        for profile in self._profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [profile.summary() for profile in reversed(self._profiles)]
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles a request when it carries the admin
+    header with the configured token, or when it falls in the sample
+    rate. One request is profiled at a time per worker; others pass
+    straight through. The profile id is returned in the X-Profile-Id
+    response header.
+
+    Only installed when PROFILING_ENABLED is set, so a disabled
+    deployment runs none of this code.
+    """
+
+    def __init__(self, app, store: ProfileStore, token: str, sample_rate: float, interval: float):
+        self.app = app
+        self.store = store
+        self.token = token.encode()
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self._busy = threading.Lock()
+
+    def _trigger(self, scope) -> Optional[str]:
+        if self.token:
+            for name, value in scope.get("headers", []):
+                if name == PROFILE_HEADER and hmac.compare_digest(value, self.token):
+                    return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(
+            scope["method"], scope["path"], trigger, threading.get_ident(), root_frame=sys._getframe()
+        )
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]}
+            await send(message)
+
+        sampler = StackSampler(profile, self.interval)
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            profile.wall_ms = (time.perf_counter() - start) * 1000
+            _current_profile.reset(token)
+            self._busy.release()
+            self.store.add(profile)
+
+
+profile_store = ProfileStore(max_profiles=settings.PROFILING_BUFFER_SIZE)
@@ -0,0 +1,33 @@
+from typing import Optional
+
+from openai import AsyncOpenAI
+
+from .config import settings
+
+_client: Optional[AsyncOpenAI] = None
+
+
+def get_qwen_client() -> AsyncOpenAI:
+    """
+    The worker's OpenAI client configured for the Qwen API.
+
+    One client, so every call (hedges included) reuses its pooled
+    keep-alive connections instead of opening a connection and TLS
+    session each. Closed by close_qwen_client() at shutdown.
+    """
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=settings.QWEN_API_KEY,
+            base_url=settings.QWEN_API_ENDPOINT or "https://dashscope-intl.aliyuncs.com/compatible-mode/v1",
+            timeout=settings.QWEN_TIMEOUT_SECONDS,
+        )
+    return _client
+
+
+async def close_qwen_client() -> None:
+    """Close the shared client's connection pool (app shutdown)."""
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        await client.close()
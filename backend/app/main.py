@@ -1,9 +1,43 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .api.v1 import auth, uploads, ai, health, test
+from .api.v1 import auth, uploads, ai, health, test, admin
+from .core.admission import AdmissionMiddleware, upload_admission, ADMISSION_PATHS
+from .core.config import settings
+from .core.profiling import ProfilingMiddleware, profile_store
+from .core.qwen import close_qwen_client
+from .core.db import SessionLocal
+from .services.notification_service import NotificationDispatcher, get_notification_sink
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    dispatcher = None
+    if settings.NOTIFICATION_DISPATCHER_ENABLED:
+        dispatcher = NotificationDispatcher(
+            session_factory=SessionLocal,
+            sink=get_notification_sink(),
+            batch_size=settings.NOTIFICATION_BATCH_SIZE,
+            poll_interval=settings.NOTIFICATION_POLL_SECONDS,
+        )
+        dispatcher.start()
+    yield
+    if dispatcher is not None:
+        await dispatcher.stop()
+    await close_qwen_client()
+
 
-app = FastAPI(title="SmartBarangay Forms API", version="0.1.0")
+app = FastAPI(title="SmartBarangay Forms API", version="0.1.0", lifespan=lifespan)
+
+# Admission control on upload endpoints (added first so CORS wraps its 429/503s)
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=upload_admission,
+    paths=ADMISSION_PATHS,
+    trusted_proxies=settings.ADMISSION_TRUSTED_PROXIES,
+)
 
 # CORS (dev-friendly)
 app.add_middleware(
@@ -14,12 +48,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# On-demand profiling (outermost, so admission queueing is included)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        token=settings.PROFILING_TOKEN,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        interval=settings.PROFILING_INTERVAL_MS / 1000,
+    )
+
 # Routers
 app.include_router(health.router, prefix="/api/v1")
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(uploads.router, prefix="/api/v1/uploads", tags=["uploads"])
 app.include_router(ai.router, prefix="/api/v1/ai", tags=["ai"])
 app.include_router(test.router, prefix="/api/v1", tags=["test"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
 
 
 @app.get("/")
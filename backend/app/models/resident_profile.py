@@ -0,0 +1,29 @@
+from sqlalchemy import Text, ForeignKey, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime, timezone
+
+from ..core.db import Base
+
+
+class ResidentProfile(Base):
+    """
+    Admin-confirmed, normalised identity fields for a resident, taken from
+    their approved submissions. Later forms are filled from it instead of
+    re-extracting the resident's ID.
+    """
+    __tablename__ = "resident_profiles"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    # JSON {field: value}
+    fields: Mapped[str] = mapped_column(Text, default="{}")
+    # JSON {field: {"submission_id": ..., "form_type": ..., "confirmed_at": ...}}
+    provenance: Mapped[str] = mapped_column(Text, default="{}")
+    source_submission_id: Mapped[int] = mapped_column(ForeignKey("submissions.id"))
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
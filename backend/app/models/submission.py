@@ -1,16 +1,26 @@
 from sqlalchemy import String, Integer, Text, ForeignKey, DateTime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
+import enum
 
 from ..core.db import Base
 
+
+class SubmissionStatus(str, enum.Enum):
+    """Submission review states."""
+    PENDING = "PENDING"
+    APPROVED = "APPROVED"
+    CORRECTION_REQUESTED = "CORRECTION_REQUESTED"
+    REJECTED = "REJECTED"
+
+
 class Submission(Base):
     __tablename__ = "submissions"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     form_type: Mapped[str] = mapped_column(String(100))
-    status: Mapped[str] = mapped_column(String(50), default="PENDING")
+    status: Mapped[str] = mapped_column(String(50), default=SubmissionStatus.PENDING.value)
     document_url: Mapped[str] = mapped_column(Text)
     extracted_data: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,12 @@
+from datetime import datetime
+from typing import Any, Dict
+
+from pydantic import BaseModel
+
+class ResidentProfileOut(BaseModel):
+    user_id: int
+    fields: Dict[str, Any]
+    provenance: Dict[str, Dict[str, Any]]
+    source_submission_id: int
+    created_at: datetime
+    updated_at: datetime
@@ -6,3 +6,6 @@ class SubmissionOut(BaseModel):
     status: str
     document_url: str
     extracted_data: str | None = None
+
+    class Config:
+        from_attributes = True
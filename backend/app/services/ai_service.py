@@ -1,15 +1,62 @@
 import os
 import base64
-from typing import Dict
-from openai import OpenAI
+import json
+import re
+from typing import Dict, Optional
 from ..core.config import settings
+from ..core.qwen import get_qwen_client
+from ..core.cache import shared_cache, make_key
+from ..core.hedging import qwen_hedger
+from ..core.circuit_breaker import qwen_breakers, CircuitOpenError
+from ..core.profiling import stage
+from .document_classifier import document_classifier
 
+EXTRACTION_MODEL = "qwen3-vl-flash"
 
-def get_qwen_client() -> OpenAI:
-    """Get OpenAI client configured for Qwen API."""
-    return OpenAI(
-        api_key=settings.QWEN_API_KEY,
-        base_url=settings.QWEN_API_ENDPOINT or "https://dashscope-intl.aliyuncs.com/compatible-mode/v1",
+EXTRACTION_PROMPT = """Extract all information from this document. 
+        Focus on:
+        - Full name
+        - ID number
+        - Date of birth
+        - Address
+        - Sex/Gender
+        - All other relevant personal information
+        
+        Return the information in JSON format with keys: full_name, id_number, date_of_birth, address, sex, and any other fields you find.
+        If a field is not present, use null."""
+
+# Compact prompts with a fixed output schema for document types the local
+# classifier recognises; anything else gets EXTRACTION_PROMPT.
+DOCUMENT_SCHEMAS = {
+    "national_id": (
+        "Philippine national ID (PhilSys) card",
+        ["full_name", "first_name", "middle_name", "last_name", "id_number", "date_of_birth", "sex", "address",
+         "place_of_birth", "civil_status", "blood_type"],
+    ),
+    "drivers_license": (
+        "Philippine driver's license",
+        ["full_name", "first_name", "middle_name", "last_name", "id_number", "date_of_birth", "sex", "address",
+         "nationality", "blood_type"],
+    ),
+    "birth_certificate": (
+        "Philippine certificate of live birth",
+        ["full_name", "first_name", "middle_name", "last_name", "date_of_birth", "sex", "place_of_birth",
+         "mothers_maiden_name", "fathers_name"],
+    ),
+}
+
+# Output cap for schema prompts: a filled schema is well under this
+SCHEMA_MAX_TOKENS = 400
+
+
+def extraction_prompt(document_type: Optional[str]) -> str:
+    """The prompt for a document type; the generic one for "other" or None."""
+    if document_type not in DOCUMENT_SCHEMAS:
+        return EXTRACTION_PROMPT
+    label, keys = DOCUMENT_SCHEMAS[document_type]
+    return (
+        f"This image is a {label}. Return ONLY a JSON object with exactly these keys: {', '.join(keys)}. "
+        "Dates as YYYY-MM-DD. Use null for anything not shown."
     )
 
 
@@ -19,11 +66,32 @@ def encode_image_to_base64(image_path: str) -> str:
         return base64.b64encode(image_file.read()).decode("utf-8")
 
 
-async def extract_fields_from_document(document_url: str) -> Dict:
+def parse_extraction_response(response_text: str) -> Dict:
+    """Pull the JSON object out of a model reply, or wrap the raw text."""
+    # Look for JSON in code blocks or raw JSON
+    json_match = re.search(r'```(?:json)?\s*({.*?})\s*```', response_text, re.DOTALL)
+    if json_match:
+        return json.loads(json_match.group(1))
+    # Try to parse as raw JSON
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError:
+        # Fallback: return the raw text
+        return {"raw_text": response_text}
+
+
+async def extract_fields_from_document(document_url: str, document_type: Optional[str] = None) -> Dict:
     """
     Extract fields from a document using Qwen VL.
     For local files, pass absolute path. For remote, pass URL.
+    Results for local files are cached across workers by image content.
+    
+    Local files are labelled by the document classifier (when an index is
+    configured) unless document_type is given; known types get a compact
+    prompt and a result with exactly that type's keys.
     """
+    cache_key = None
+    
     # Check if it's a local file or URL
     if document_url.startswith("http://") or document_url.startswith("https://"):
         # Remote image URL
@@ -44,62 +112,70 @@ async def extract_fields_from_document(document_url: str) -> Dict:
         }
         mime_type = mime_map.get(ext, "image/jpeg")
         
-        base64_image = encode_image_to_base64(document_url)
+        with open(document_url, "rb") as image_file:
+            image_bytes = image_file.read()
+        
+        if document_type is None and document_classifier is not None:
+            with stage("classify"):
+                document_type, _ = document_classifier.classify(image_bytes)
+        
+        cache_key = make_key(EXTRACTION_MODEL, extraction_prompt(document_type), image_bytes)
+        cached = await shared_cache.aget("extraction", cache_key)
+        if cached is not None:
+            return cached
+        
+        with stage("base64_encode"):
+            base64_image = base64.b64encode(image_bytes).decode("utf-8")
         image_content = {
             "type": "image_url",
             "image_url": {"url": f"data:{mime_type};base64,{base64_image}"}
         }
     
+    prompt = extraction_prompt(document_type)
+    schema = DOCUMENT_SCHEMAS.get(document_type, (None, None))[1]
+    limits = {"max_tokens": SCHEMA_MAX_TOKENS} if schema else {}
+    
     try:
         client = get_qwen_client()
         
-        # Create extraction prompt
-        prompt = """Extract all information from this document. 
-        Focus on:
-        - Full name
-        - ID number
-        - Date of birth
-        - Address
-        - Sex/Gender
-        - All other relevant personal information
+        async def attempt() -> Dict:
+            async with stage("qwen_extraction"):
+                completion = await client.chat.completions.create(
+                    model=EXTRACTION_MODEL, 
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": prompt},
+                                image_content
+                            ]
+                        }
+                    ],
+                    temperature=0.15,  # Low temperature for consistent extraction
+                    **limits,
+                )
+            with stage("json_parse"):
+                return parse_extraction_response(completion.choices[0].message.content)
         
-        Return the information in JSON format with keys: full_name, id_number, date_of_birth, address, sex, and any other fields you find.
-        If a field is not present, use null."""
-        
-        completion = client.chat.completions.create(
-            model="qwen3-vl-flash", 
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        image_content
-                    ]
-                }
-            ],
-            temperature=0.15,  # Low temperature for consistent extraction
+        # A slow call is duplicated; the first parseable answer wins.
+        # The breaker fails fast while the model is unhealthy.
+        extracted_data = await qwen_breakers.get(EXTRACTION_MODEL).call(
+            lambda: qwen_hedger.run("extraction", attempt, lambda data: "raw_text" not in data)
         )
         
-        # Parse response
-        response_text = completion.choices[0].message.content
-        
-        # Try to extract JSON from response
-        import json
-        import re
+        if schema and "raw_text" not in extracted_data:
+            # Every schema key, then anything else the model read off the card
+            extracted_data = {
+                **{key: extracted_data.get(key) for key in schema},
+                **{key: value for key, value in extracted_data.items() if key not in schema and value is not None},
+            }
         
-        # Look for JSON in code blocks or raw JSON
-        json_match = re.search(r'```(?:json)?\s*({.*?})\s*```', response_text, re.DOTALL)
-        if json_match:
-            extracted_data = json.loads(json_match.group(1))
-        else:
-            # Try to parse as raw JSON
-            try:
-                extracted_data = json.loads(response_text)
-            except json.JSONDecodeError:
-                # Fallback: return the raw text
-                extracted_data = {"raw_text": response_text}
+        if cache_key is not None and "raw_text" not in extracted_data:
+            await shared_cache.aset("extraction", cache_key, extracted_data)
         
         return extracted_data
         
+    except CircuitOpenError as e:
+        return {"error": str(e), "retry_after": e.retry_after}
     except Exception as e:
         return {"error": str(e)}
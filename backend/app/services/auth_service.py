@@ -1,13 +1,45 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import Optional
+from sqlalchemy import select, update, insert, literal, func, cast, String
+from sqlalchemy.exc import IntegrityError
+from typing import Optional, List, Dict, Any, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import asyncio
+import csv
+import os
+
+from email_validator import validate_email, EmailNotValidError
 
 from ..models.user import User, UserRole
+from ..models.notification import NotificationOutbox, NotificationStatus
+from ..core.config import settings
 from ..core.security import get_password_hash, verify_password
+from .notification_service import enqueue_notification
+
+# Cap on per-row problems echoed back from a bulk import
+MAX_REPORTED_ROWS = 1000
+
+_hash_executor: Optional[ThreadPoolExecutor] = None
+
+
+def normalize_email(email: str) -> str:
+    """
+    Canonical form of an email address: validated, then lowercased as a
+    whole, so register, login and import agree on who is who.
+    Raises ValueError if the address is invalid.
+    """
+    try:
+        return validate_email(email.strip(), check_deliverability=False).normalized.lower()
+    except EmailNotValidError as e:
+        raise ValueError(f"invalid email: {e}")
 
 
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
-    """Retrieve a user by email."""
+    """
+    Retrieve a user by normalised email (normalize_email). Stored emails
+    are normalised too (scripts/normalize_emails.py for older rows), so
+    this is a plain lookup on the unique index.
+    """
     result = await db.execute(select(User).where(User.email == email))
     return result.scalar_one_or_none()
 
@@ -22,10 +54,11 @@ async def register_user(
     db: AsyncSession, email: str, password: str, name: str
 ) -> User:
     """
-    Register a new user.
+    Register a new user under the normalised email.
     Returns the created user.
-    Raises ValueError if email already exists.
+    Raises ValueError if the email is invalid or already exists.
     """
+    email = normalize_email(email)
     # Check if user already exists
     existing_user = await get_user_by_email(db, email)
     if existing_user:
@@ -50,9 +83,13 @@ async def authenticate_user(
     db: AsyncSession, email: str, password: str
 ) -> Optional[User]:
     """
-    Authenticate a user by email and password.
+    Authenticate a user by email (any case) and password.
     Returns the user if credentials are valid, None otherwise.
     """
+    try:
+        email = normalize_email(email)
+    except ValueError:
+        return None
     user = await get_user_by_email(db, email)
     if not user:
         return None
@@ -64,6 +101,7 @@ async def authenticate_user(
 async def verify_user(db: AsyncSession, user_id: int) -> User:
     """
     Mark a user as verified (admin action after in-person verification).
+    The resident's notification is queued in the same commit.
     Returns the updated user.
     Raises ValueError if user not found.
     """
@@ -71,9 +109,18 @@ async def verify_user(db: AsyncSession, user_id: int) -> User:
     if not user:
         raise ValueError("User not found")
     
-    user.verified = True
-    await db.commit()
-    await db.refresh(user)
+    if not user.verified:
+        user.verified = True
+        # Committed with the update; the dispatcher sends it later
+        enqueue_notification(
+            db,
+            user_id=user.id,
+            recipient=user.email,
+            event="user_verified",
+            payload={"name": user.name},
+            idempotency_key=f"user_verified:{user.id}",
+        )
+        await db.commit()
     return user
 
 
@@ -91,3 +138,191 @@ async def set_user_role(db: AsyncSession, user_id: int, role: UserRole) -> User:
     await db.commit()
     await db.refresh(user)
     return user
+
+
+async def bulk_verify_users(db: AsyncSession, user_ids: List[int]) -> int:
+    """
+    Mark many users as verified (admin action) with one set-based UPDATE.
+    Notifications for users not already verified are queued in the same
+    commit by an INSERT ... SELECT, so no rows are loaded into Python.
+    Returns the number of users newly verified.
+    """
+    ids = sorted(set(user_ids))
+    if not ids:
+        return 0
+
+    now = datetime.now(timezone.utc)
+    pending = (User.id.in_(ids), User.verified.is_(False))
+    await db.execute(
+        insert(NotificationOutbox).from_select(
+            [
+                NotificationOutbox.idempotency_key,
+                NotificationOutbox.user_id,
+                NotificationOutbox.recipient,
+                NotificationOutbox.channel,
+                NotificationOutbox.event,
+                NotificationOutbox.payload,
+                NotificationOutbox.status,
+                NotificationOutbox.attempts,
+                NotificationOutbox.next_attempt_at,
+                NotificationOutbox.created_at,
+            ],
+            select(
+                literal("user_verified:") + cast(User.id, String),
+                User.id,
+                User.email,
+                literal("email"),
+                literal("user_verified"),
+                cast(func.json_object("name", User.name), String),
+                literal(NotificationStatus.PENDING.value),
+                literal(0),
+                literal(now),
+                literal(now),
+            ).where(*pending),
+        )
+    )
+    result = await db.execute(
+        update(User).where(*pending).values(verified=True, updated_at=now)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def bulk_set_user_role(db: AsyncSession, user_ids: List[int], role: UserRole) -> int:
+    """
+    Set the role of many users (admin action) with one set-based UPDATE.
+    Returns the number of users changed.
+    """
+    ids = sorted(set(user_ids))
+    if not ids:
+        return 0
+
+    result = await db.execute(
+        update(User)
+        .where(User.id.in_(ids), User.role != role.value)
+        .values(role=role.value, updated_at=datetime.now(timezone.utc))
+    )
+    await db.commit()
+    return result.rowcount
+
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    # bcrypt releases the GIL while hashing, so threads give real parallelism
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.BULK_IMPORT_HASH_WORKERS or os.cpu_count() or 4,
+            thread_name_prefix="password-hash",
+        )
+    return _hash_executor
+
+
+async def _hash_passwords(passwords: List[str]) -> List[str]:
+    loop = asyncio.get_running_loop()
+    executor = _get_hash_executor()
+    return await asyncio.gather(*(loop.run_in_executor(executor, get_password_hash, p) for p in passwords))
+
+
+async def import_users_from_csv(
+    db: AsyncSession, lines: Iterable[str], batch_size: int = 500
+) -> Dict[str, Any]:
+    """
+    Register residents from a CSV with columns email, name, password and an
+    optional verified (true/false) column.
+
+    The CSV is read as a stream and handled batch_size rows at a time:
+    emails are normalised as on registration (normalize_email), then
+    checked against the file so far and the database in one
+    query per batch, passwords are hashed in parallel on a thread pool,
+    and each batch is inserted with one multi-row INSERT and committed.
+
+    Returns:
+        {"created": int, "duplicates": [{"row", "email", "reason"}], "errors": [{"row", "error"}]}
+    """
+    reader = csv.DictReader(lines)
+    missing_columns = {"email", "name", "password"} - set(reader.fieldnames or [])
+    if missing_columns:
+        raise ValueError(f"CSV is missing columns: {sorted(missing_columns)}")
+
+    summary: Dict[str, Any] = {"created": 0, "duplicates": [], "errors": []}
+    seen: set = set()
+    batch: List[Dict[str, Any]] = []
+
+    def report(kind: str, entry: Dict[str, Any]) -> None:
+        if len(summary[kind]) < MAX_REPORTED_ROWS:
+            summary[kind].append(entry)
+
+    for row_number, row in enumerate(reader, start=2):  # row 1 is the header
+        email = (row.get("email") or "").strip()
+        name = (row.get("name") or "").strip()
+        password = row.get("password") or ""
+        try:
+            email = normalize_email(email)
+        except ValueError as e:
+            report("errors", {"row": row_number, "error": str(e)})
+            continue
+        if not name or not password:
+            report("errors", {"row": row_number, "error": "name and password are required"})
+            continue
+        if email in seen:
+            report("duplicates", {"row": row_number, "email": email, "reason": "repeated in file"})
+            continue
+        seen.add(email)
+        batch.append({
+            "row": row_number,
+            "email": email,
+            "name": name,
+            "password": password,
+            "verified": (row.get("verified") or "").strip().lower() in ("true", "1", "yes"),
+        })
+        if len(batch) >= batch_size:
+            await _insert_user_batch(db, batch, summary, report)
+            batch = []
+
+    if batch:
+        await _insert_user_batch(db, batch, summary, report)
+    return summary
+
+
+async def _insert_user_batch(db: AsyncSession, batch: List[Dict[str, Any]], summary: Dict[str, Any], report) -> None:
+    existing = await db.execute(
+        select(User.email).where(User.email.in_([r["email"] for r in batch]))
+    )
+    taken = set(existing.scalars())
+    fresh = []
+    for r in batch:
+        if r["email"] in taken:
+            report("duplicates", {"row": r["row"], "email": r["email"], "reason": "already registered"})
+        else:
+            fresh.append(r)
+    if not fresh:
+        return
+
+    hashes = await _hash_passwords([r["password"] for r in fresh])
+    values = [
+        {
+            "email": r["email"],
+            "name": r["name"],
+            "password_hash": password_hash,
+            "verified": r["verified"],
+            "role": UserRole.RESIDENT.value,
+        }
+        for r, password_hash in zip(fresh, hashes)
+    ]
+    try:
+        await db.execute(insert(User), values)
+        await db.commit()
+    except IntegrityError:
+        # Someone registered one of these emails since the check; insert row by row
+        await db.rollback()
+        for r, value in zip(fresh, values):
+            try:
+                await db.execute(insert(User), [value])
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+                report("duplicates", {"row": r["row"], "email": r["email"], "reason": "already registered"})
+                continue
+            summary["created"] += 1
+        return
+    summary["created"] += len(values)
@@ -0,0 +1,136 @@
+import io
+import logging
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_TYPES = ("national_id", "drivers_license", "birth_certificate", "other")
+
+LAYOUT_SIZE = 8
+HUE_BINS = 12
+VALUE_BINS = 4
+
+
+def extract_features(image_bytes: bytes) -> Optional[np.ndarray]:
+    """
+    Layout and colour features from a small thumbnail: aspect ratio,
+    a saturation-weighted hue histogram, a brightness histogram and an
+    8x8 contrast-normalised grayscale grid. Returns None if the bytes are
+    not a readable image.
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image.draft("RGB", (128, 128))  # fast JPEG downscale on decode
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            aspect = image.width / image.height
+            image.thumbnail((64, 64))
+            hsv = np.asarray(image.convert("HSV"), dtype=np.float32).reshape(-1, 3) / 255.0
+            gray = image.convert("L").resize((LAYOUT_SIZE, LAYOUT_SIZE), Image.Resampling.BOX)
+    except (UnidentifiedImageError, OSError):
+        return None
+
+    hue, saturation, value = hsv[:, 0], hsv[:, 1], hsv[:, 2]
+    hue_hist, _ = np.histogram(hue, bins=HUE_BINS, range=(0, 1), weights=saturation)
+    hue_hist /= max(1.0, len(hue))
+    value_hist, _ = np.histogram(value, bins=VALUE_BINS, range=(0, 1))
+    value_hist = value_hist / len(value)
+
+    layout = np.asarray(gray, dtype=np.float32).ravel()
+    layout = (layout - layout.mean()) / (layout.std() + 1e-6)
+
+    return np.concatenate([
+        [np.log(aspect), saturation.mean()],
+        hue_hist,
+        value_hist,
+        layout,
+    ]).astype(np.float32)
+
+
+class DocumentClassifier:
+    """
+    k-nearest-neighbour classifier over thumbnail features.
+
+    Features are standardised with the training set's mean and spread.
+    An image whose nearest example is further than reject_distance (set
+    from the spread of nearest-neighbour distances in the training set),
+    or whose neighbours disagree too much, is labelled "other".
+    """
+
+    def __init__(self, features: np.ndarray, labels: List[str], k: int = 5, min_confidence: float = 0.6):
+        self.mean = features.mean(axis=0)
+        self.scale = features.std(axis=0) + 1e-6
+        self.features = (features - self.mean) / self.scale
+        self.labels = np.asarray(labels)
+        self.k = min(k, len(labels))
+        self.min_confidence = min_confidence
+        self.reject_distance = self._reject_distance()
+
+    def _reject_distance(self) -> float:
+        if len(self.features) < 2:
+            return float("inf")
+        nearest = np.empty(len(self.features), dtype=np.float32)
+        for start in range(0, len(self.features), 256):  # chunked to bound memory
+            block = self.features[start:start + 256]
+            distances = np.linalg.norm(block[:, None, :] - self.features[None, :, :], axis=2)
+            distances[np.arange(len(block)), np.arange(start, start + len(block))] = np.inf
+            nearest[start:start + len(block)] = distances.min(axis=1)
+        return float(np.percentile(nearest, 99) * 2)
+
+    def predict(self, features: np.ndarray) -> Tuple[str, float]:
+        """Return (document_type, confidence)."""
+        distances = np.linalg.norm(self.features - (features - self.mean) / self.scale, axis=1)
+        nearest = np.argsort(distances)[: self.k]
+        if distances[nearest[0]] > self.reject_distance:
+            return "other", 0.0
+        weights = 1.0 / (distances[nearest] + 1e-6)
+        votes = {}
+        for label, weight in zip(self.labels[nearest], weights):
+            votes[label] = votes.get(label, 0.0) + weight
+        label, score = max(votes.items(), key=lambda item: item[1])
+        confidence = score / weights.sum()
+        if confidence < self.min_confidence:
+            return "other", float(confidence)
+        return str(label), float(confidence)
+
+    def classify(self, image_bytes: bytes) -> Tuple[str, float]:
+        features = extract_features(image_bytes)
+        if features is None:
+            return "other", 0.0
+        return self.predict(features)
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path,
+            features=self.features * self.scale + self.mean,
+            labels=self.labels,
+            k=self.k,
+        )
+
+    @classmethod
+    def load(cls, path: str, min_confidence: float = 0.6) -> "DocumentClassifier":
+        with np.load(path) as data:
+            return cls(data["features"], list(data["labels"]), k=int(data["k"]), min_confidence=min_confidence)
+
+
+def load_document_classifier() -> Optional[DocumentClassifier]:
+    """The classifier from DOC_CLASSIFIER_INDEX_PATH, or None (generic prompt) if unset or unreadable."""
+    path = settings.DOC_CLASSIFIER_INDEX_PATH
+    if not path:
+        return None
+    if not os.path.exists(path):
+        logger.warning("document classifier index %s not found; using the generic extraction prompt", path)
+        return None
+    try:
+        return DocumentClassifier.load(path, min_confidence=settings.DOC_CLASSIFIER_MIN_CONFIDENCE)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("document classifier index %s unreadable (%s); using the generic extraction prompt", path, e)
+        return None
+
+
+document_classifier = load_document_classifier()
@@ -0,0 +1,562 @@
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageOps, UnidentifiedImageError
+
+from ..core.cache import prepare_cache_file
+from ..core.config import settings
+from .ai_service import extract_fields_from_document
+
+logger = logging.getLogger(__name__)
+
+# Working resolution for deskewing and cropping (longest side, pixels)
+ANALYSIS_SIDE = 512
+# Side of the stored fingerprint canvas and of the cells compared in it
+FINGERPRINT_SIDE = 512
+FINGERPRINT_CELL = 16
+# Fewer cells with content than this (a logo, a blank page) can't confirm a match
+MIN_COMPARED_CELLS = 96
+# Largest skew corrected, and the scale range registration searches
+MAX_SKEW_DEGREES = 8.0
+MIN_SCALE, MAX_SCALE = 0.7, 1.43
+
+
+def _load_gray(image_bytes: bytes) -> Image.Image:
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.draft("L", (ANALYSIS_SIDE, ANALYSIS_SIDE))  # fast JPEG downscale on decode
+        image = ImageOps.exif_transpose(image).convert("L")
+        image.thumbnail((ANALYSIS_SIDE, ANALYSIS_SIDE))
+        return image
+
+
+def _ink_mask(pixels: np.ndarray, reach: int = 5) -> np.ndarray:
+    """Thin dark strokes: pixels well below the brightest pixel on both sides."""
+    height, width = pixels.shape
+    padded = np.pad(pixels, reach, mode="edge")
+
+    def brightest(dy: int, dx: int) -> np.ndarray:
+        out = np.zeros_like(pixels)
+        for k in range(1, reach + 1):
+            y, x = reach + dy * k, reach + dx * k
+            out = np.maximum(out, padded[y:y + height, x:x + width])
+        return out
+
+    horizontal = np.minimum(brightest(0, -1), brightest(0, 1))
+    vertical = np.minimum(brightest(-1, 0), brightest(1, 0))
+    return (pixels < 0.75 * horizontal) | (pixels < 0.75 * vertical)
+
+
+def _background_mask(image: Image.Image, tolerance: int = 24) -> np.ndarray:
+    """Whatever the photo shows around the document: flood-filled from the corners."""
+    marked = image.convert("RGB")
+    marker = (255, 0, 0)  # never occurs in a grayscale image
+    for corner in ((0, 0), (image.width - 1, 0), (0, image.height - 1), (image.width - 1, image.height - 1)):
+        if marked.getpixel(corner) != marker:
+            ImageDraw.floodfill(marked, corner, marker, thresh=tolerance)
+    red, green, _ = marked.split()
+    mask = Image.fromarray(((np.asarray(red) == 255) & (np.asarray(green) == 0)).astype(np.uint8) * 255)
+    return np.asarray(mask.filter(ImageFilter.MaxFilter(7))) > 0
+
+
+def _skew_angle(ink: np.ndarray) -> float:
+    """Rotation (degrees) that best lines up the text rows, by projection profile."""
+    ys, xs = np.nonzero(ink)
+    if len(xs) < 200:
+        return 0.0
+    step = max(1, len(xs) // 30000)
+    xs = xs[::step].astype(np.float32)
+    ys = ys[::step].astype(np.float32)
+
+    def sharpness(degrees: float) -> float:
+        theta = np.radians(degrees)
+        rows = ys * np.cos(theta) - xs * np.sin(theta)
+        counts = np.bincount((rows - rows.min()).astype(np.int64)).astype(np.float64)
+        return float((counts * counts).sum())
+
+    coarse = max(np.arange(-MAX_SKEW_DEGREES, MAX_SKEW_DEGREES + 1e-6, 0.5), key=sharpness)
+    return float(max(np.arange(coarse - 0.4, coarse + 0.41, 0.1), key=sharpness))
+
+
+def _normalise(image: Image.Image) -> Image.Image:
+    """Deskew the document and crop it to its printed content."""
+    angle = _skew_angle(_ink_mask(np.asarray(image, dtype=np.float32)))
+    if abs(angle) >= 0.2:
+        pixels = np.asarray(image)
+        m = max(2, min(pixels.shape) // 50)
+        border = np.concatenate([pixels[:m].ravel(), pixels[-m:].ravel(), pixels[:, :m].ravel(), pixels[:, -m:].ravel()])
+        image = image.rotate(angle, resample=Image.Resampling.BILINEAR, expand=True, fillcolor=int(np.median(border)))
+
+    ink = _ink_mask(np.asarray(image, dtype=np.float32))
+    background = _background_mask(image)
+    if background.mean() < 0.7:  # otherwise the flood fill leaked into the document
+        ink &= ~background
+    ys, xs = np.nonzero(ink)
+    if len(xs) > 200:
+        top, bottom = np.percentile(ys, [0.5, 99.5])
+        left, right = np.percentile(xs, [0.5, 99.5])
+        image = image.crop((int(left), int(top), int(right) + 1, int(bottom) + 1))
+    return image
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT_32 = _dct_matrix(32)
+
+
+def _phash(image: Image.Image) -> int:
+    """DCT perceptual hash: the 8x8 lowest frequencies (minus DC) against their median."""
+    pixels = np.asarray(image.resize((32, 32), Image.Resampling.BOX), dtype=np.float32)
+    low = (_DCT_32 @ pixels @ _DCT_32.T)[:8, :8].ravel()[1:]
+    value = 0
+    for bit in low > np.median(low):
+        value = (value << 1) | int(bit)
+    return value
+
+
+@dataclass
+class DocumentFingerprint:
+    phash: int
+    canvas: bytes                   # FINGERPRINT_SIDE² grayscale, document centred on a flat fill
+    box: Tuple[int, int, int, int]  # where the document sits on the canvas
+
+    def image(self) -> Image.Image:
+        return Image.frombytes("L", (FINGERPRINT_SIDE, FINGERPRINT_SIDE), self.canvas)
+
+    def mask(self) -> Image.Image:
+        mask = Image.new("L", (FINGERPRINT_SIDE, FINGERPRINT_SIDE), 0)
+        left, top, right, bottom = self.box
+        mask.paste(255, (left + 8, top + 8, right - 8, bottom - 8))  # clear of the seam and _detail's blur across it
+        return mask
+
+
+def document_fingerprint(image_bytes: bytes) -> Optional[DocumentFingerprint]:
+    """
+    Fingerprint a document photo for near-duplicate matching.
+
+    The photo is deskewed (projection profile of its ink) and cropped to the
+    printed content, so rotation, framing and background do not move the
+    hash. The cropped document, aspect ratio kept, is also stored on a
+    FINGERPRINT_SIDE canvas for match_score. Returns None if the bytes are
+    not a readable image.
+    """
+    try:
+        document = _normalise(_load_gray(image_bytes))
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+
+    thumbnail = document.copy()
+    thumbnail.thumbnail((FINGERPRINT_SIDE, FINGERPRINT_SIDE), Image.Resampling.BOX)
+    canvas = Image.new("L", (FINGERPRINT_SIDE, FINGERPRINT_SIDE), int(np.median(np.asarray(thumbnail))))
+    left = (FINGERPRINT_SIDE - thumbnail.width) // 2
+    top = (FINGERPRINT_SIDE - thumbnail.height) // 2
+    canvas.paste(thumbnail, (left, top))
+    return DocumentFingerprint(
+        phash=_phash(document),
+        canvas=canvas.tobytes(),
+        box=(left, top, left + thumbnail.width, top + thumbnail.height),
+    )
+
+
+def _detail(image: Image.Image) -> np.ndarray:
+    """Band-pass: strokes and edges, without lighting gradients."""
+    fine = np.asarray(image.filter(ImageFilter.BoxBlur(1)), dtype=np.float32)
+    coarse = np.asarray(image.filter(ImageFilter.BoxBlur(6)), dtype=np.float32)
+    return fine - coarse
+
+
+def _warp(image: Image.Image, scale: float, tx: float, ty: float) -> Image.Image:
+    return image.transform(
+        image.size, Image.Transform.AFFINE, (scale, 0, tx, 0, scale, ty), resample=Image.Resampling.BILINEAR
+    )
+
+
+def _phase_correlation(reference: np.ndarray, b: np.ndarray) -> Tuple[float, int, int]:
+    """Peak height and (dy, dx) shift taking b onto a, given reference = rfft2(a)."""
+    spectrum = reference * np.conj(np.fft.rfft2(b))
+    surface = np.fft.irfft2(spectrum / (np.abs(spectrum) + 1e-6), s=b.shape)
+    dy, dx = divmod(int(surface.argmax()), surface.shape[1])
+    half = surface.shape[0] // 2
+    return float(surface.max()), (dy + half) % surface.shape[0] - half, (dx + half) % surface.shape[1] - half
+
+
+def _scale_search(a: Image.Image, b: Image.Image, scales) -> List[Tuple[float, float, float, float]]:
+    """(peak, scale, tx, ty) per scale, best first, in a's pixel units."""
+    reference = np.fft.rfft2(_detail(a))
+    results = []
+    for scale in scales:
+        centre = a.width / 2 * (1 - scale)  # scale about the middle of the canvas
+        peak, dy, dx = _phase_correlation(reference, _detail(_warp(b, scale, centre, centre)))
+        results.append((peak, scale, centre - dx * scale, centre - dy * scale))
+    return sorted(results, reverse=True)
+
+
+def _register(a: Image.Image, b: Image.Image, candidates: int = 4) -> Tuple[float, float, float]:
+    """Scale and translation mapping canvas a onto canvas b (coarse 64px, refined 128px then 256px)."""
+    a64, b64 = (image.resize((64, 64), Image.Resampling.BOX) for image in (a, b))
+    coarse = _scale_search(a64, b64, np.exp(np.arange(np.log(MIN_SCALE), np.log(MAX_SCALE), 0.02)))
+    a128, b128 = (image.resize((128, 128), Image.Resampling.BOX) for image in (a, b))
+    refine = np.exp(np.arange(-0.03, 0.031, 0.005))
+    _, scale, tx, ty = max(_scale_search(a128, b128, guess[1] * refine)[0] for guess in coarse[:candidates])
+    a256, b256 = (image.resize((256, 256), Image.Resampling.BOX) for image in (a, b))
+    _, scale, tx, ty = _scale_search(a256, b256, scale * np.exp(np.arange(-0.004, 0.0041, 0.002)))[0]
+    factor = a.width / 256
+    return scale, tx * factor, ty * factor
+
+
+def match_score(a: DocumentFingerprint, b: DocumentFingerprint, shift: int = 2) -> float:
+    """
+    How surely two fingerprints show the same physical document, -1..1.
+
+    b is registered onto a, then both are cut into FINGERPRINT_CELL cells
+    and each cell's band-passed content is correlated (allowing a shift of
+    a couple of pixels). The score is the worst cell that has content in
+    both, or -1 when fewer than MIN_COMPARED_CELLS do: two filled-in copies
+    of the same form agree on the printed layout and differ only where the
+    handwriting or typed values do, so one disagreeing cell is enough to
+    tell them apart. The canvas is large enough that typed values on a
+    full page still fill their cells.
+    """
+    image_a, image_b = a.image(), b.image()
+    scale, tx, ty = _register(image_a, image_b)
+    detail_a = _detail(image_a)
+    detail_b = _detail(_warp(image_b, scale, tx, ty))
+    valid = (np.asarray(a.mask()) > 250) & (np.asarray(_warp(b.mask(), scale, tx, ty)) > 250)
+
+    cell = FINGERPRINT_CELL
+    inner = slice(cell, FINGERPRINT_SIDE - cell)  # the outer ring can't take a shift
+    grid = (FINGERPRINT_SIDE - 2 * cell) // cell
+
+    def per_cell(values: np.ndarray) -> np.ndarray:
+        return values.reshape(grid, cell, grid, cell).sum(axis=(1, 3))
+
+    window_a = detail_a[inner, inner]
+    energy_a = np.sqrt(per_cell(window_a * window_a))
+    inside = per_cell(valid[inner, inner].astype(np.float32)) >= cell * cell
+    best = np.full((grid, grid), -1.0)
+    best_energy_b = np.zeros((grid, grid))
+    for dy in range(-shift, shift + 1):
+        for dx in range(-shift, shift + 1):
+            window_b = detail_b[cell + dy:FINGERPRINT_SIDE - cell + dy, cell + dx:FINGERPRINT_SIDE - cell + dx]
+            energy_b = np.sqrt(per_cell(window_b * window_b))
+            score = per_cell(window_a * window_b) / (energy_a * energy_b + 1e-6)
+            better = score > best
+            best = np.where(better, score, best)
+            best_energy_b = np.where(better, energy_b, best_energy_b)
+
+    energy = np.minimum(energy_a, best_energy_b)[inside]
+    scores = best[inside]
+    if len(scores) < MIN_COMPARED_CELLS:
+        return -1.0
+    busy = energy > 0.3 * np.percentile(energy, 75)  # blank paper correlates as noise
+    if busy.sum() < MIN_COMPARED_CELLS:
+        return -1.0
+    return float(scores[busy].min())
+
+
+@dataclass
+class IndexedDocument:
+    doc_id: int
+    user_id: int
+    phash: int
+    extraction: Dict[str, Any]
+
+
+@dataclass
+class DuplicateLookup:
+    same_user: Optional[IndexedDocument]  # confirmed prior upload by the same user
+    other_users: List[IndexedDocument]    # confirmed near-duplicates uploaded by someone else
+    best_score: float = -1.0
+
+
+class _HashTables:
+    """
+    Multi-index hashing over pHashes: the hash is cut into BANDS bit
+    ranges, each with a table from that range's value to the documents.
+
+    Two hashes differing in at most BANDS * (s + 1) - 1 bits differ in at
+    most s bits within some band (pigeonhole), so probing every table with
+    the keys up to s bits away from the query finds all of them. nearest()
+    raises s one step at a time and stops once the best candidates found
+    are provably the nearest, so close matches cost a handful of probes
+    instead of a pass over the corpus.
+    """
+
+    BANDS = 4
+
+    def __init__(self, bits: int = 63):
+        width = -(-bits // self.BANDS)
+        self._bands = [(shift, min(width, bits - shift)) for shift in range(0, bits, width)]
+        self._tables: List[Dict[int, List[Tuple[int, int, int]]]] = [{} for _ in self._bands]
+        self._flips: Dict[Tuple[int, int], List[int]] = {}
+        self.size = 0
+
+    def _flips_at(self, width: int, radius: int) -> List[int]:
+        """Masks flipping exactly radius of width bits."""
+        key = (width, radius)
+        if key not in self._flips:
+            self._flips[key] = [sum(1 << bit for bit in bits) for bits in combinations(range(width), radius)]
+        return self._flips[key]
+
+    def add(self, phash: int, doc_id: int, user_id: int) -> None:
+        entry = (phash, doc_id, user_id)
+        for table, (shift, width) in zip(self._tables, self._bands):
+            table.setdefault((phash >> shift) & ((1 << width) - 1), []).append(entry)
+        self.size += 1
+
+    def nearest(self, phash: int, max_distance: int, count: int,
+                accept: Callable[[int], bool]) -> List[Tuple[int, int, int]]:
+        """Up to count (distance, doc_id, user_id) within max_distance whose user accept()s, closest first."""
+        seen = set()
+        found: List[Tuple[int, int, int]] = []
+        for radius in range(max_distance // self.BANDS + 1):
+            for table, (shift, width) in zip(self._tables, self._bands):
+                key = (phash >> shift) & ((1 << width) - 1)
+                for flip in self._flips_at(width, radius):
+                    for other, doc_id, user_id in table.get(key ^ flip, ()):
+                        if doc_id in seen:
+                            continue
+                        seen.add(doc_id)
+                        distance = (other ^ phash).bit_count()
+                        if distance <= max_distance and accept(user_id):
+                            found.append((distance, doc_id, user_id))
+            found.sort(key=lambda entry: (entry[0], -entry[1]))  # closest, then newest
+            if len(found) >= count and found[count - 1][0] <= self.BANDS * (radius + 1) - 1:
+                break
+        return found[:count]
+
+
+class NearDuplicateIndex:
+    """
+    Every processed upload, found by exact content key or by pHash
+    distance and confirmed by match_score.
+
+    Documents live in one SQLite file shared by the workers (the canvas
+    zlib-compressed, about 25 KB each); each worker keeps only the pHashes
+    in _HashTables and picks up rows other workers added before each
+    lookup, so the whole corpus is searched without a scan.
+
+    The pHash only shortlists: documents printed from one template hash
+    alike, so the closest few candidates within max_distance bits are
+    re-checked with match_score and only those scoring min_score or more
+    count as duplicates. All calls block: use them off the event loop.
+
+    Only _sync() takes the lock. The tables and per-user lists only ever
+    grow, so a search racing it at worst misses the newest rows.
+    """
+
+    def __init__(self, path: str, max_distance: int, min_score: float, candidates: int = 3):
+        self.max_distance = max_distance
+        self.min_score = min_score
+        self.candidates = candidates
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS dedup_documents ("
+            " doc_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " content_key TEXT NOT NULL,"
+            " user_id INTEGER NOT NULL,"
+            " phash INTEGER NOT NULL,"
+            " canvas BLOB NOT NULL,"
+            " box TEXT NOT NULL,"
+            " extraction TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS dedup_documents_content ON dedup_documents (content_key)")
+        self._db_lock = threading.Lock()
+        self._tables = _HashTables()
+        self._by_user: Dict[int, List[Tuple[int, int]]] = {}  # user_id -> [(phash, doc_id)]
+        self._synced_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._tables.size
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._db_lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _sync(self) -> None:
+        """Add rows written since the last sync (by any worker) to the tables."""
+        rows = self._query(
+            "SELECT doc_id, user_id, phash FROM dedup_documents WHERE doc_id > ? ORDER BY doc_id",
+            (self._synced_id,),
+        )
+        with self._lock:
+            for doc_id, user_id, phash in rows:
+                if doc_id <= self._synced_id:
+                    continue  # another thread synced it meanwhile
+                self._tables.add(phash, doc_id, user_id)
+                self._by_user.setdefault(user_id, []).append((phash, doc_id))
+                self._synced_id = doc_id
+
+    def _document(self, row: tuple) -> IndexedDocument:
+        doc_id, user_id, phash, extraction = row
+        return IndexedDocument(doc_id, user_id, phash, json.loads(extraction))
+
+    def _fingerprint(self, doc_id: int) -> Tuple[DocumentFingerprint, IndexedDocument]:
+        canvas, box, *row = self._query(
+            "SELECT canvas, box, doc_id, user_id, phash, extraction FROM dedup_documents WHERE doc_id = ?",
+            (doc_id,),
+        )[0]
+        document = self._document(tuple(row))
+        return DocumentFingerprint(document.phash, zlib.decompress(canvas), tuple(json.loads(box))), document
+
+    def add(self, content_key: str, fingerprint: DocumentFingerprint, user_id: int,
+            extraction: Dict[str, Any]) -> None:
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT INTO dedup_documents (content_key, user_id, phash, canvas, box, extraction, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (content_key, user_id, fingerprint.phash, zlib.compress(fingerprint.canvas, 6),
+                 json.dumps(fingerprint.box), json.dumps(extraction), time.time()),
+            )
+        self._sync()
+
+    def exact(self, content_key: str) -> List[IndexedDocument]:
+        """Earlier uploads of these exact bytes, newest first."""
+        rows = self._query(
+            "SELECT doc_id, user_id, phash, extraction FROM dedup_documents"
+            " WHERE content_key = ? ORDER BY doc_id DESC",
+            (content_key,),
+        )
+        return [self._document(row) for row in rows]
+
+    def lookup(self, fingerprint: DocumentFingerprint, user_id: int) -> DuplicateLookup:
+        """Confirmed near-duplicates of fingerprint."""
+        self._sync()
+        own = sorted(
+            (((phash ^ fingerprint.phash).bit_count(), doc_id) for phash, doc_id in self._by_user.get(user_id, ())),
+            key=lambda entry: (entry[0], -entry[1]),  # closest, then newest
+        )
+        own_ids = [doc_id for distance, doc_id in own if distance <= self.max_distance][:self.candidates]
+        others = self._tables.nearest(
+            fingerprint.phash, self.max_distance, self.candidates, lambda other: other != user_id
+        )
+
+        same_user: Optional[IndexedDocument] = None
+        best_score = -1.0
+        for doc_id in own_ids:
+            candidate, document = self._fingerprint(doc_id)
+            score = match_score(fingerprint, candidate)
+            best_score = max(best_score, score)
+            if score >= self.min_score:
+                same_user = document
+                break
+        confirmed: Dict[int, IndexedDocument] = {}
+        for _, doc_id, other_user in others:
+            if other_user in confirmed:
+                continue
+            candidate, document = self._fingerprint(doc_id)
+            score = match_score(fingerprint, candidate)
+            best_score = max(best_score, score)
+            if score >= self.min_score:
+                confirmed[other_user] = document
+        return DuplicateLookup(same_user, list(confirmed.values()), best_score)
+
+
+def build_document_index() -> NearDuplicateIndex:
+    """The index from settings; kept in memory (this worker only) for ":memory:" or if its file cannot be secured."""
+    path = settings.PHASH_INDEX_PATH or os.path.join(settings.APP_DATA_DIR, "dedup_index.sqlite3")
+    if path != ":memory:":
+        try:
+            prepare_cache_file(path)
+        except (OSError, ValueError) as e:
+            logger.error("near-duplicate index not persisted: %s", e)
+            path = ":memory:"
+    return NearDuplicateIndex(
+        path,
+        max_distance=settings.PHASH_MAX_DISTANCE,
+        min_score=settings.PHASH_MIN_MATCH_SCORE,
+        candidates=settings.PHASH_CONFIRM_CANDIDATES,
+    )
+
+
+document_hash_index = build_document_index()
+
+# Cross-user near-duplicates waiting for an admin to look at them
+duplicate_flags: deque = deque(maxlen=settings.PHASH_FLAG_LIMIT)
+
+
+async def extract_fields_with_dedup(
+    document_path: str,
+    image_bytes: bytes,
+    user_id: Optional[int]
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Extract fields from a document, reusing the prior result when the same
+    user already uploaded the same document.
+
+    Byte-identical uploads are recognised by their SHA-256 alone. Anything
+    else is only reused once match_score confirms it, so another document
+    printed from the same template is extracted afresh. Confirmed
+    duplicates of another user's upload are still extracted, but are
+    recorded in duplicate_flags for admin review. Anonymous uploads
+    (user_id None) bypass the index, and an index error only costs the
+    reuse.
+
+    Returns:
+        Tuple of (extracted_data, dedup_info) where dedup_info is
+        {"reused": bool, "flagged_users": [...]}
+    """
+    if user_id is None:
+        return await extract_fields_from_document(document_path), {"reused": False, "flagged_users": []}
+
+    content_key = hashlib.sha256(image_bytes).hexdigest()
+    fingerprint = None
+    try:
+        exact = await asyncio.to_thread(document_hash_index.exact, content_key)
+        same_user = next((document for document in exact if document.user_id == user_id), None)
+        others = {document.user_id: document for document in exact if document.user_id != user_id}
+        best_score = 1.0 if exact else -1.0
+        if same_user is None:
+            fingerprint = await asyncio.to_thread(document_fingerprint, image_bytes)
+            if fingerprint is not None:
+                match = await asyncio.to_thread(document_hash_index.lookup, fingerprint, user_id)
+                same_user = match.same_user
+                for document in match.other_users:
+                    others.setdefault(document.user_id, document)
+                best_score = max(best_score, match.best_score)
+    except sqlite3.Error as e:
+        logger.warning("near-duplicate lookup failed: %s", e)
+        same_user, others, best_score = None, {}, -1.0
+
+    flagged_users = sorted(others)
+    if flagged_users:
+        duplicate_flags.append({
+            "user_id": user_id,
+            "matching_user_ids": flagged_users,
+            "image_hash": f"{fingerprint.phash if fingerprint is not None else exact[0].phash:016x}",
+            "match_score": round(best_score, 3),
+            "flagged_at": time.time(),
+        })
+
+    if same_user is not None:
+        return dict(same_user.extraction), {"reused": True, "flagged_users": flagged_users}
+
+    extracted_data = await extract_fields_from_document(document_path)
+    if "error" not in extracted_data and fingerprint is not None:
+        try:
+            await asyncio.to_thread(document_hash_index.add, content_key, fingerprint, user_id, extracted_data)
+        except sqlite3.Error as e:
+            logger.warning("near-duplicate index write failed: %s", e)
+    return extracted_data, {"reused": False, "flagged_users": flagged_users}
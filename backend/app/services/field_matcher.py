@@ -0,0 +1,264 @@
+import re
+import zlib
+from datetime import date
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+# Concepts that appear on barangay forms, with the field names / extraction
+# keys (already normalised: lowercase, no numeric suffix) that mean them.
+SYNONYMS: Dict[str, List[str]] = {
+    "full_name": ["full_name", "fullname", "name", "complete_name", "applicant_name", "resident_name", "pangalan"],
+    "first_name": ["first_name", "firstname", "given_name", "givenname", "fname", "first"],
+    "middle_name": ["middle_name", "middlename", "mname", "middle"],
+    "last_name": ["last_name", "lastname", "surname", "family_name", "lname", "apelyido", "last"],
+    "suffix": ["suffix", "name_suffix", "name_extension", "ext_name"],
+    "date_of_birth": ["date_of_birth", "birthday", "birthdate", "birth_date", "dob", "bday", "kapanganakan"],
+    "place_of_birth": ["place_of_birth", "birthplace", "birth_place", "pob"],
+    "age": ["age", "edad"],
+    "sex": ["sex", "gender", "kasarian"],
+    "civil_status": ["civil_status", "marital_status", "status_civil"],
+    "blood_type": ["blood_type", "bloodtype", "blood_group"],
+    "address": ["address", "complete_address", "home_address", "present_address", "residential_address",
+                "permanent_address", "residence", "tirahan"],
+    "barangay": ["barangay", "brgy"],
+    "city": ["city", "city_municipality", "municipality", "town"],
+    "province": ["province"],
+    "zip_code": ["zip_code", "zipcode", "zip", "postal_code"],
+    "contact_no": ["contact_no", "contact_number", "cellphone_no", "cellphone", "mobile_no", "mobile_number",
+                   "phone", "phone_no", "telephone", "tel_no"],
+    "email": ["email", "email_address"],
+    "id_number": ["id_number", "id_no", "psn", "philsys_number", "pcn", "license_no", "valid_id_no"],
+    "nationality": ["nationality", "citizenship"],
+    "occupation": ["occupation", "trabaho", "profession"],
+    "date_today": ["date_today", "date_filed", "date_of_application", "date_signed"],
+}
+
+# Tokens that make a field about someone other than the resident. A target
+# carrying one only matches a source that carries the same token.
+QUALIFIERS = ("emergency", "mother", "mothers", "father", "fathers", "spouse", "guardian", "relative",
+              "relatives", "contact_person", "beneficiary", "witness", "issued")
+
+SURNAME_PARTICLES = {"de", "del", "dela", "delos", "de la", "de los", "san", "santa", "sta", "sto", "santo"}
+
+NGRAM_DIM = 4096
+DEFAULT_THRESHOLD = 0.75
+REVIEW_THRESHOLD = 0.45
+
+_ALIAS_TO_CONCEPT = {alias: concept for concept, aliases in SYNONYMS.items() for alias in aliases}
+
+
+def normalize_field_name(name: str) -> str:
+    """
+    Lowercase, split camelCase, collapse separators and strip numeric
+    variant suffixes, so "firstName_2" and "first-name" both become "first_name".
+    """
+    text = re.sub(r"([a-z])([A-Z])", r"\1_\2", name)
+    text = re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+    text = re.sub(r"(?:_\d+|(?<=[a-z])\d+)$", "", text)
+    return text
+
+
+def concept_of(name: str) -> Optional[str]:
+    return _ALIAS_TO_CONCEPT.get(normalize_field_name(name))
+
+
+@lru_cache(maxsize=8192)
+def _ngram_vector(text: str) -> np.ndarray:
+    """Hashed, L2-normalised character 2/3-gram counts of a normalised name."""
+    vector = np.zeros(NGRAM_DIM, dtype=np.float32)
+    padded = f"^{text}$"
+    grams = [padded[i:i + n] for n in (2, 3) for i in range(len(padded) - n + 1)]
+    if not grams:
+        return vector
+    buckets = np.fromiter((zlib.crc32(g.encode()) % NGRAM_DIM for g in grams), dtype=np.int64, count=len(grams))
+    np.add.at(vector, buckets, 1.0)
+    vector /= np.linalg.norm(vector)
+    return vector
+
+
+def _qualifier_mask(names: List[str]) -> np.ndarray:
+    """Bitmask per name of which QUALIFIERS it contains."""
+    mask = np.zeros(len(names), dtype=np.int64)
+    for i, name in enumerate(names):
+        for bit, token in enumerate(QUALIFIERS):
+            if token in name:
+                mask[i] |= 1 << bit
+    return mask
+
+
+def split_full_name(full_name: str) -> Dict[str, str]:
+    """
+    Split a Filipino full name into first / middle / last.
+
+    The surname is the last word plus any particles before it ("Dela Cruz");
+    the word before the surname is the middle name when at least two remain.
+    """
+    words = full_name.split()
+    if len(words) < 2:
+        return {}
+
+    last = [words.pop()]
+    while words and words[-1].lower().rstrip(".") in SURNAME_PARTICLES:
+        last.insert(0, words.pop())
+    parts = {"last_name": " ".join(last)}
+    if len(words) >= 2:
+        parts["middle_name"] = words.pop()
+    if words:
+        parts["first_name"] = " ".join(words)
+    return parts
+
+
+def _age_from(date_of_birth: str) -> Optional[str]:
+    try:
+        born = date.fromisoformat(date_of_birth)
+    except (TypeError, ValueError):
+        return None
+    today = date.today()
+    return str(today.year - born.year - ((today.month, today.day) < (born.month, born.day)))
+
+
+def _source_values(extracted_data: Dict[str, Any]) -> Dict[str, Tuple[str, str]]:
+    """
+    Flatten extracted data into {source_key: (value, origin_key)}, adding
+    values derivable without a model (name parts, full name, age, today's date).
+    """
+    sources: Dict[str, Tuple[str, str]] = {}
+    for key, value in extracted_data.items():
+        if value is None or isinstance(value, (dict, list)) or str(value).strip() == "":
+            continue
+        sources[key] = (str(value).strip(), key)
+
+    by_concept = {concept_of(key): key for key in sources if concept_of(key)}
+
+    if "full_name" in by_concept:
+        origin = by_concept["full_name"]
+        for concept, value in split_full_name(sources[origin][0]).items():
+            if concept not in by_concept:
+                sources[concept] = (value, origin)
+    elif "first_name" in by_concept and "last_name" in by_concept:
+        parts = [sources[by_concept[c]][0] for c in ("first_name", "middle_name", "last_name") if c in by_concept]
+        sources["full_name"] = (" ".join(parts), by_concept["first_name"])
+
+    if "date_of_birth" in by_concept and "age" not in by_concept:
+        age = _age_from(sources[by_concept["date_of_birth"]][0])
+        if age is not None:
+            sources["age"] = (age, by_concept["date_of_birth"])
+
+    if "date_today" not in by_concept:
+        sources["date_today"] = (date.today().isoformat(), "date_today")
+
+    return sources
+
+
+def score_matrix(source_keys: List[str], form_fields: List[str]) -> np.ndarray:
+    """
+    Similarity of every (source, target) pair, shape (len(source_keys), len(form_fields)).
+
+    A source is scored through all of its concept's synonyms and keeps the
+    best alias; exact concept matches score 1.0; targets about someone
+    else (mother, emergency contact, ...) are halved unless the source
+    is about the same person.
+    """
+    source_names = [normalize_field_name(k) for k in source_keys]
+    target_names = [normalize_field_name(f) for f in form_fields]
+
+    aliases: List[str] = []
+    offsets: List[int] = []
+    for name in source_names:
+        offsets.append(len(aliases))
+        concept = _ALIAS_TO_CONCEPT.get(name)
+        aliases.append(name)
+        if concept:
+            aliases.extend(a for a in SYNONYMS[concept] if a != name)
+
+    alias_vectors = np.stack([_ngram_vector(a) for a in aliases])
+    target_vectors = np.stack([_ngram_vector(t) for t in target_names])
+    scores = np.maximum.reduceat(alias_vectors @ target_vectors.T, offsets, axis=0)
+
+    source_concepts = np.array([_ALIAS_TO_CONCEPT.get(n, "") for n in source_names], dtype=object)
+    target_concepts = np.array([_ALIAS_TO_CONCEPT.get(n, "") for n in target_names], dtype=object)
+    exact = (source_concepts[:, None] == target_concepts[None, :]) & (target_concepts[None, :] != "")
+    scores = np.where(exact, 1.0, scores)
+
+    source_mask = _qualifier_mask(source_names)
+    target_mask = _qualifier_mask(target_names)
+    foreign = (target_mask[None, :] & ~source_mask[:, None]) != 0
+    return np.where(foreign, scores * 0.5, scores)
+
+
+def match_fields(
+    extracted_data: Dict[str, Any],
+    form_fields: List[str],
+    threshold: float = DEFAULT_THRESHOLD
+) -> Dict[str, Any]:
+    """
+    Map extracted document data to PDF form fields without calling a model.
+
+    Args:
+        extracted_data: Data extracted from document (e.g., {"full_name": "Juan Dela Cruz"})
+        form_fields: List of field names from the PDF form
+        threshold: Minimum similarity for a target to be filled
+
+    Returns:
+        Same shape as map_extracted_data_to_form_fields:
+        {"mappings": [...], "filled_fields": {...}, "missing_fields": [...]}
+    """
+    sources = _source_values(extracted_data)
+    if not sources or not form_fields:
+        return {"mappings": [], "filled_fields": {}, "missing_fields": list(form_fields)}
+
+    source_keys = list(sources)
+    scores = score_matrix(source_keys, form_fields)
+    best_source = scores.argmax(axis=0)
+    best_score = scores[best_source, np.arange(len(form_fields))]
+
+    filled_fields: Dict[str, str] = {}
+    missing_fields: List[str] = []
+    by_origin: Dict[str, List[Dict[str, str]]] = {}
+    for target, source_index, score in zip(form_fields, best_source, best_score):
+        if score < threshold:
+            missing_fields.append(target)
+            continue
+        value, origin = sources[source_keys[source_index]]
+        filled_fields[target] = value
+        by_origin.setdefault(origin, []).append({"field": target, "value": value})
+
+    mappings = []
+    for origin, targets in by_origin.items():
+        form_mapping = (
+            {"type": "single", "field": targets[0]["field"]}
+            if len(targets) == 1
+            else {"type": "multiple", "fields": targets}
+        )
+        mappings.append({
+            "type": "single",
+            "field": origin,
+            "value": sources[origin][0] if origin in sources else targets[0]["value"],
+            "form_mapping": form_mapping,
+        })
+
+    return {"mappings": mappings, "filled_fields": filled_fields, "missing_fields": missing_fields}
+
+
+def ambiguous_fields(
+    extracted_data: Dict[str, Any],
+    result: Dict[str, Any],
+    low: float = REVIEW_THRESHOLD
+) -> List[str]:
+    """
+    Missing fields from a match_fields result that some unused extracted
+    value resembles (score between low and the fill threshold). These are
+    the only fields worth asking a model about.
+    """
+    used = {m.get("field") for m in result.get("mappings", [])}
+    unused = [
+        key for key, value in extracted_data.items()
+        if key not in used and value not in (None, "") and not isinstance(value, (dict, list))
+    ]
+    missing = result.get("missing_fields", [])
+    if not unused or not missing:
+        return []
+    best = score_matrix(unused, missing).max(axis=0)
+    return [field for field, score in zip(missing, best) if score >= low]
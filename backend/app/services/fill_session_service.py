@@ -0,0 +1,385 @@
+import asyncio
+import base64
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional
+
+from ..core.cache import SharedCache, shared_cache
+from ..core.config import settings
+from .pdf_form_service import fill_pdf_bytes
+
+@dataclass
+class FillSession:
+    """
+    Server-side state of one auto-fill: the template, what was extracted,
+    how it was mapped and the current filled PDF. profile_fields names the
+    fields filled from the resident's profile whose values must not be
+    returned to the caller (until the caller sets them).
+    """
+    id: str
+    template_pdf: bytes
+    form_fields: List[str]
+    extracted_data: Dict[str, Any]
+    mappings: List[Dict[str, Any]]
+    filled_fields: Dict[str, str]
+    filled_pdf: bytes
+    expires_at: float
+    created_at: float = field(default_factory=time.time)
+    profile_fields: List[str] = field(default_factory=list)
+
+    @property
+    def missing_fields(self) -> List[str]:
+        return [f for f in self.form_fields if not self.filled_fields.get(f)]
+
+    @property
+    def size_bytes(self) -> int:
+        # The PDFs dominate; field dicts are small enough to ignore
+        return len(self.template_pdf) + len(self.filled_pdf)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "template_pdf": base64.b64encode(self.template_pdf).decode("ascii"),
+            "form_fields": self.form_fields,
+            "extracted_data": self.extracted_data,
+            "mappings": self.mappings,
+            "filled_fields": self.filled_fields,
+            "filled_pdf": base64.b64encode(self.filled_pdf).decode("ascii"),
+            "expires_at": self.expires_at,
+            "created_at": self.created_at,
+            "profile_fields": self.profile_fields,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "FillSession":
+        return cls(**{
+            **data,
+            "template_pdf": base64.b64decode(data["template_pdf"]),
+            "filled_pdf": base64.b64decode(data["filled_pdf"]),
+        })
+
+
+def _new_session(
+    ttl_seconds: int,
+    template_pdf: bytes,
+    form_fields: List[str],
+    extracted_data: Dict[str, Any],
+    mappings: List[Dict[str, Any]],
+    filled_fields: Dict[str, str],
+    filled_pdf: bytes,
+    profile_fields: Optional[List[str]] = None,
+) -> FillSession:
+    return FillSession(
+        id=secrets.token_urlsafe(16),
+        template_pdf=template_pdf,
+        form_fields=list(form_fields),
+        extracted_data=extracted_data,
+        mappings=mappings,
+        filled_fields=dict(filled_fields),
+        filled_pdf=filled_pdf,
+        expires_at=time.time() + ttl_seconds,
+        profile_fields=list(profile_fields or []),
+    )
+
+
+def _session_delta(session: FillSession, fields: Dict[str, Any]) -> Dict[str, str]:
+    """
+    The values in fields that differ from the session's; None or "" clears
+    a field. Raises ValueError for field names the form does not have.
+    """
+    unknown = [name for name in fields if name not in session.form_fields]
+    if unknown:
+        raise ValueError(f"Unknown form fields: {unknown}")
+
+    delta = {name: "" if value is None else str(value) for name, value in fields.items()}
+    return {name: value for name, value in delta.items() if session.filled_fields.get(name, "") != value}
+
+
+def _apply_delta(session: FillSession, delta: Dict[str, str], filled_pdf: bytes) -> None:
+    session.filled_pdf = filled_pdf
+    session.profile_fields = [name for name in session.profile_fields if name not in delta]
+    for name, value in delta.items():
+        if value:
+            session.filled_fields[name] = value
+        else:
+            session.filled_fields.pop(name, None)
+
+
+class FillSessionStoreError(Exception):
+    """A fill session could not be stored or read; the caller gets no session_id."""
+
+
+class FillSessionStore:
+    """
+    In-memory fill sessions keyed by id.
+
+    Sessions expire ttl_seconds after their last use and are never evicted
+    before that: a write that would exceed max_count or max_bytes raises
+    FillSessionStoreError instead.
+
+    Sessions live in one worker's memory: with several uvicorn workers a
+    follow-up request served by another worker gets a 404. Only used when
+    the shared cache is disabled; see SharedFillSessionStore.
+    """
+
+    def __init__(self, ttl_seconds: int, max_count: int, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, FillSession]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    async def create(
+        self,
+        template_pdf: bytes,
+        form_fields: List[str],
+        extracted_data: Dict[str, Any],
+        mappings: List[Dict[str, Any]],
+        filled_fields: Dict[str, str],
+        filled_pdf: bytes,
+        profile_fields: Optional[List[str]] = None,
+    ) -> FillSession:
+        session = _new_session(
+            self.ttl_seconds, template_pdf, form_fields, extracted_data, mappings, filled_fields, filled_pdf,
+            profile_fields,
+        )
+        with self._lock:
+            self._expire()
+            if len(self._sessions) + 1 > self.max_count:
+                raise FillSessionStoreError("Too many open fill sessions; try again later")
+            self._reserve(session.size_bytes)
+            self._sessions[session.id] = session
+            self._total_bytes += session.size_bytes
+        return session
+
+    async def get(self, session_id: str) -> Optional[FillSession]:
+        """Return a live session and extend its TTL, or None if unknown/expired."""
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            session.expires_at = time.time() + self.ttl_seconds
+            self._sessions.move_to_end(session_id)
+            return session
+
+    async def apply_delta(self, session_id: str, fields: Dict[str, Any]) -> Optional[FillSession]:
+        """
+        Apply changed or newly provided field values to a session.
+
+        Only the delta is written into the current filled PDF; a value of
+        None or "" clears the field. Returns None if the session is unknown.
+        Raises ValueError for field names the form does not have, and
+        FillSessionStoreError if the new PDF does not fit the budget.
+        """
+        session = await self.get(session_id)
+        if session is None:
+            return None
+
+        delta = _session_delta(session, fields)
+        if not delta:
+            return session
+
+        filled_pdf = await asyncio.to_thread(fill_pdf_bytes, session.filled_pdf, delta)
+
+        with self._lock:
+            growth = len(filled_pdf) - len(session.filled_pdf)
+            self._reserve(growth)
+            self._total_bytes += growth
+            _apply_delta(session, delta, filled_pdf)
+        return session
+
+    async def delete(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return False
+            self._total_bytes -= session.size_bytes
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "bytes": self._total_bytes}
+
+    def _reserve(self, size: int) -> None:
+        # Caller holds the lock
+        if size > self.max_bytes:
+            raise FillSessionStoreError(f"Fill session is too large to keep ({size} bytes, limit {self.max_bytes})")
+        if self._total_bytes + size > self.max_bytes:
+            raise FillSessionStoreError("Too many open fill sessions; try again later")
+
+    def _expire(self) -> None:
+        # Caller holds the lock. Oldest-used sessions sit at the front.
+        now = time.time()
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if oldest.expires_at > now:
+                break
+            del self._sessions[oldest_id]
+            self._total_bytes -= oldest.size_bytes
+
+
+class SharedFillSessionStore:
+    """
+    Fill sessions kept in their own table of the node-local shared cache
+    file, so the GET/PATCH that follows an auto-fill finds its session
+    whichever uvicorn worker serves it. Same interface as FillSessionStore.
+
+    The table is outside the result cache's LRU: a session only goes away
+    when it expires (ttl_seconds after its last use) or is deleted. Its own
+    max_count/max_bytes budget is enforced on write, and a write that does
+    not fit raises FillSessionStoreError instead of evicting live sessions.
+    Two PATCHes to the same session racing on different workers are
+    last-writer-wins.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int, max_count: int, max_bytes: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fill_sessions ("
+                " id TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _write(self, session: FillSession) -> None:
+        """Insert or replace a session within the budget; raises FillSessionStoreError."""
+        session.expires_at = time.time() + self.ttl_seconds
+        payload = json.dumps(session.to_json()).encode("utf-8")
+        if len(payload) > self.max_bytes:
+            raise FillSessionStoreError(
+                f"Fill session is too large to keep ({len(payload)} bytes, limit {self.max_bytes})"
+            )
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM fill_sessions WHERE expires_at <= ?", (time.time(),))
+                count, total = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM fill_sessions WHERE id != ?", (session.id,)
+                ).fetchone()
+                if count + 1 > self.max_count or total + len(payload) > self.max_bytes:
+                    raise FillSessionStoreError("Too many open fill sessions; try again later")
+                conn.execute(
+                    "INSERT OR REPLACE INTO fill_sessions (id, value, size, expires_at) VALUES (?, ?, ?, ?)",
+                    (session.id, payload, len(payload), session.expires_at),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            raise FillSessionStoreError(f"Fill session store failed: {e}") from e
+
+    def _read(self, session_id: str) -> Optional[FillSession]:
+        """A live session with its TTL extended once less than half is left; raises FillSessionStoreError."""
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, expires_at FROM fill_sessions WHERE id = ? AND expires_at > ?", (session_id, now)
+            ).fetchone()
+            if row is None:
+                return None
+            session = FillSession.from_json(json.loads(row[0]))
+            session.expires_at = row[1]
+            if session.expires_at - now < self.ttl_seconds / 2:
+                session.expires_at = now + self.ttl_seconds
+                conn.execute("UPDATE fill_sessions SET expires_at = ? WHERE id = ?", (session.expires_at, session_id))
+            return session
+        except sqlite3.Error as e:
+            raise FillSessionStoreError(f"Fill session store failed: {e}") from e
+
+    def _delete(self, session_id: str) -> bool:
+        try:
+            cursor = self._connection().execute(
+                "DELETE FROM fill_sessions WHERE id = ? AND expires_at > ?", (session_id, time.time())
+            )
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            raise FillSessionStoreError(f"Fill session store failed: {e}") from e
+
+    async def create(
+        self,
+        template_pdf: bytes,
+        form_fields: List[str],
+        extracted_data: Dict[str, Any],
+        mappings: List[Dict[str, Any]],
+        filled_fields: Dict[str, str],
+        filled_pdf: bytes,
+        profile_fields: Optional[List[str]] = None,
+    ) -> FillSession:
+        """Store a new session; raises FillSessionStoreError if it cannot be kept."""
+        session = _new_session(
+            self.ttl_seconds, template_pdf, form_fields, extracted_data, mappings, filled_fields, filled_pdf,
+            profile_fields,
+        )
+        await asyncio.to_thread(self._write, session)
+        return session
+
+    async def get(self, session_id: str) -> Optional[FillSession]:
+        """Return a live session, or None if unknown/expired."""
+        return await asyncio.to_thread(self._read, session_id)
+
+    async def apply_delta(self, session_id: str, fields: Dict[str, Any]) -> Optional[FillSession]:
+        """See FillSessionStore.apply_delta; raises FillSessionStoreError if the result cannot be kept."""
+        session = await self.get(session_id)
+        if session is None:
+            return None
+
+        delta = _session_delta(session, fields)
+        if not delta:
+            return session
+
+        filled_pdf = await asyncio.to_thread(fill_pdf_bytes, session.filled_pdf, delta)
+        _apply_delta(session, delta, filled_pdf)
+        await asyncio.to_thread(self._write, session)
+        return session
+
+    async def delete(self, session_id: str) -> bool:
+        return await asyncio.to_thread(self._delete, session_id)
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        try:
+            count, total = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM fill_sessions WHERE expires_at > ?", (time.time(),)
+            ).fetchone()
+        except sqlite3.Error:
+            count, total = None, None
+        return {"sessions": count, "bytes": total}
+
+
+fill_session_store = (
+    SharedFillSessionStore(
+        shared_cache.path,
+        ttl_seconds=settings.FILL_SESSION_TTL_SECONDS,
+        max_count=settings.FILL_SESSION_MAX_COUNT,
+        max_bytes=settings.FILL_SESSION_MAX_BYTES,
+    )
+    if isinstance(shared_cache, SharedCache)
+    else FillSessionStore(
+        ttl_seconds=settings.FILL_SESSION_TTL_SECONDS,
+        max_count=settings.FILL_SESSION_MAX_COUNT,
+        max_bytes=settings.FILL_SESSION_MAX_BYTES,
+    )
+)
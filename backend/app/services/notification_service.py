@@ -0,0 +1,248 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..core.config import settings
+from ..models.notification import NotificationOutbox, NotificationStatus
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES: Dict[str, Dict[str, str]] = {
+    "user_verified": {
+        "subject": "Your SmartBarangay account is verified",
+        "body": "Hi {name}, your identity was verified at the barangay hall. You can now submit forms.",
+    },
+    "submission_approved": {
+        "subject": "Your {form_type} was approved",
+        "body": "Hi {name}, your {form_type} submission #{submission_id} was approved.",
+    },
+    "submission_correction_requested": {
+        "subject": "Your {form_type} needs a correction",
+        "body": "Hi {name}, please correct your {form_type} submission #{submission_id}. {note}",
+    },
+    "submission_rejected": {
+        "subject": "Your {form_type} was rejected",
+        "body": "Hi {name}, your {form_type} submission #{submission_id} was rejected. {note}",
+    },
+}
+
+
+def enqueue_notification(
+    db: AsyncSession,
+    user_id: int,
+    recipient: str,
+    event: str,
+    payload: Dict[str, Any],
+    idempotency_key: str,
+    channel: str = "email",
+) -> NotificationOutbox:
+    """
+    Add a notification to the outbox without committing.
+    The caller commits it together with the change it announces.
+    """
+    row = NotificationOutbox(
+        idempotency_key=idempotency_key,
+        user_id=user_id,
+        recipient=recipient,
+        channel=channel,
+        event=event,
+        payload=json.dumps(payload),
+    )
+    db.add(row)
+    return row
+
+
+async def is_notification_queued(db: AsyncSession, idempotency_key: str) -> bool:
+    """Whether a notification with this key is already in the outbox (in any state)."""
+    result = await db.execute(
+        select(NotificationOutbox.id).where(NotificationOutbox.idempotency_key == idempotency_key)
+    )
+    return result.first() is not None
+
+
+def render_notification(row: NotificationOutbox) -> Dict[str, Any]:
+    payload = json.loads(row.payload or "{}")
+    template = TEMPLATES.get(row.event, {"subject": row.event, "body": ""})
+    values = {"note": "", **payload}
+    return {
+        "idempotency_key": row.idempotency_key,
+        "channel": row.channel,
+        "to": row.recipient,
+        "event": row.event,
+        "subject": template["subject"].format(**values),
+        "body": template["body"].format(**values).strip(),
+    }
+
+
+class ConsoleNotificationSink:
+    """Stand-in provider that logs messages instead of sending them."""
+
+    def __init__(self):
+        self._delivered: Set[str] = set()
+
+    def send_batch(self, messages: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        """Returns {idempotency_key: None if delivered, else the error}."""
+        for message in messages:
+            if message["idempotency_key"] in self._delivered:
+                continue
+            logger.info("notification %s -> %s: %s", message["channel"], message["to"], message["subject"])
+            self._delivered.add(message["idempotency_key"])
+        return {message["idempotency_key"]: None for message in messages}
+
+
+class FileNotificationSink:
+    """
+    Stand-in provider that appends messages to a JSON-lines file.
+    Keys already in the file are skipped, so retried batches are not
+    delivered twice.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._delivered: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._delivered.add(json.loads(line)["idempotency_key"])
+                    except (ValueError, KeyError):
+                        continue
+
+    def send_batch(self, messages: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        """
+        Returns {idempotency_key: None if delivered, else the error}. A
+        message that can't be serialised fails alone; a write or fsync
+        error fails every message not yet known to be on disk.
+        """
+        results: Dict[str, Optional[str]] = {}
+        with self._lock:
+            lines = []
+            for message in messages:
+                key = message["idempotency_key"]
+                if key in self._delivered:
+                    results[key] = None
+                    continue
+                try:
+                    lines.append((key, json.dumps({**message, "sent_at": datetime.now(timezone.utc).isoformat()})))
+                except (TypeError, ValueError) as e:
+                    results[key] = f"unserialisable message: {e}"
+            if not lines:
+                return results
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for _, line in lines:
+                        f.write(line + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError as e:
+                results.update((key, str(e)) for key, _ in lines)
+                return results
+            self._delivered.update(key for key, _ in lines)
+            results.update((key, None) for key, _ in lines)
+        return results
+
+
+def get_notification_sink():
+    if settings.NOTIFICATION_SINK == "file":
+        return FileNotificationSink(settings.NOTIFICATION_SINK_PATH)
+    return ConsoleNotificationSink()
+
+
+async def dispatch_pending(session_factory: async_sessionmaker, sink, batch_size: int) -> int:
+    """
+    Send one batch of due outbox rows and record the outcome.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED so several
+    workers can drain the outbox without sending the same row twice.
+    The sink reports each message separately, so only the rows it
+    rejected are retried, with exponential backoff until
+    NOTIFICATION_MAX_ATTEMPTS, then marked FAILED. If the sink call
+    itself raises, every row in the batch counts as failed.
+
+    Returns:
+        Number of rows processed
+    """
+    now = datetime.now(timezone.utc)
+    async with session_factory() as db:
+        result = await db.execute(
+            select(NotificationOutbox)
+            .where(
+                NotificationOutbox.status == NotificationStatus.PENDING.value,
+                NotificationOutbox.next_attempt_at <= now,
+            )
+            .order_by(NotificationOutbox.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        rows = list(result.scalars())
+        if not rows:
+            return 0
+
+        try:
+            results = await asyncio.to_thread(sink.send_batch, [render_notification(row) for row in rows])
+        except Exception as e:
+            results = {row.idempotency_key: str(e) for row in rows}
+
+        failed, last_error = 0, None
+        for row in rows:
+            row.attempts += 1
+            error = results.get(row.idempotency_key, "no result from sink")
+            if error is None:
+                row.status = NotificationStatus.SENT.value
+                row.sent_at = now
+            else:
+                failed += 1
+                row.last_error = last_error = error
+                if row.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                    row.status = NotificationStatus.FAILED.value
+                else:
+                    backoff = settings.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (row.attempts - 1)
+                    row.next_attempt_at = now + timedelta(seconds=backoff)
+        await db.commit()
+        if failed:
+            logger.warning("%d of %d notifications failed; last error: %s", failed, len(rows), last_error)
+        return len(rows)
+
+
+class NotificationDispatcher:
+    """Background task that drains the outbox in batches."""
+
+    def __init__(self, session_factory: async_sessionmaker, sink, batch_size: int, poll_interval: float):
+        self.session_factory = session_factory
+        self.sink = sink
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                processed = await dispatch_pending(self.session_factory, self.sink, self.batch_size)
+            except Exception:
+                logger.exception("notification dispatch failed")
+                processed = 0
+            # Keep draining while batches come back full
+            if processed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
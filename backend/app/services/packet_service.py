@@ -0,0 +1,74 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Any
+
+from .pdf_form_service import get_pdf_form_fields, fill_pdf_bytes, merge_pdfs, validate_and_prepare_field_data
+from .pdf_mapping_service import map_extracted_data_to_form_fields
+
+
+def _read_form_fields(template: bytes) -> List[str]:
+    # get_pdf_form_fields works on paths (and caches by content)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        tmp.write(template)
+        tmp_path = tmp.name
+    try:
+        return get_pdf_form_fields(tmp_path)
+    finally:
+        os.unlink(tmp_path)
+
+
+async def _fill_one(name: str, template: bytes, extracted_data: Dict[str, Any]) -> Dict[str, Any]:
+    form_fields = await asyncio.to_thread(_read_form_fields, template)
+    mapping_result = await map_extracted_data_to_form_fields(extracted_data, form_fields)
+    filled_fields = mapping_result.get("filled_fields", {})
+    valid_data, _ = validate_and_prepare_field_data(filled_fields, form_fields)
+    filled_pdf = await asyncio.to_thread(fill_pdf_bytes, template, valid_data)
+    return {
+        "form": name,
+        "form_fields": form_fields,
+        "mappings": mapping_result.get("mappings", []),
+        "filled_fields": valid_data,
+        "missing_fields": mapping_result.get("missing_fields", []),
+        "filled_pdf": filled_pdf,
+    }
+
+
+async def fill_form_packet(extracted_data: Dict[str, Any], templates: Dict[str, bytes]) -> List[Dict[str, Any]]:
+    """
+    Map one extraction onto several PDF templates and fill them concurrently.
+    
+    Args:
+        extracted_data: Output of extract_fields_from_document (after validation)
+        templates: {form_name: template PDF bytes}, in packet order
+    
+    Returns:
+        One dict per form with form, form_fields, mappings, filled_fields,
+        missing_fields and filled_pdf (bytes), in the same order as templates
+    """
+    return await asyncio.gather(*(
+        _fill_one(name, template, extracted_data) for name, template in templates.items()
+    ))
+
+
+def package_packet(results: List[Dict[str, Any]], output_format: str) -> bytes:
+    """
+    Bundle filled forms as one merged PDF ("pdf") or a ZIP of PDFs plus a
+    manifest of missing fields per form ("zip"). CPU-bound: call off the
+    event loop.
+    """
+    if output_format == "pdf":
+        return merge_pdfs([r["filled_pdf"] for r in results])
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for r in results:
+            # PDF streams are already compressed; deflating them again only costs CPU
+            archive.writestr(f"filled_{Path(r['form']).stem}.pdf", r["filled_pdf"], compress_type=zipfile.ZIP_STORED)
+        manifest = {r["form"]: {"missing_fields": r["missing_fields"]} for r in results}
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    return buffer.getvalue()
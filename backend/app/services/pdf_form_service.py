@@ -1,9 +1,14 @@
 import os
 import tempfile
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Union
 from pathlib import Path
 from PyPDFForm import PdfWrapper
 
+from ..core.cache import shared_cache, make_key
+from ..core.profiling import stage
+
+FORM_FIELDS_TTL_SECONDS = 7 * 24 * 3600
+
 
 def get_pdf_form_fields(pdf_path: str) -> List[str]:
     """
@@ -16,24 +21,79 @@ def get_pdf_form_fields(pdf_path: str) -> List[str]:
         List of field names
     """
     try:
-        form = PdfWrapper(pdf_path)
-        schema = form.schema
+        # Templates are re-uploaded constantly; key on content, not path
+        with open(pdf_path, "rb") as f:
+            cache_key = make_key(f.read())
+        cached = shared_cache.get("form_fields", cache_key)
+        if cached is not None:
+            return cached
+        
+        with stage("pdf_read_fields"):
+            form = PdfWrapper(pdf_path)
+            schema = form.schema
         
         # schema is a dict like {'type': 'object', 'properties': {'field1': {...}, 'field2': {...}}}
         # Extract only the field names from the 'properties' key
+        fields = []
         if schema and isinstance(schema, dict):
             if 'properties' in schema:
                 # Extract field names from the properties dict
-                return list(schema['properties'].keys())
+                fields = list(schema['properties'].keys())
             else:
                 # Fallback: if schema is just a dict of fields
-                return list(schema.keys())
+                fields = list(schema.keys())
         
-        return []
+        shared_cache.set("form_fields", cache_key, fields, ttl=FORM_FIELDS_TTL_SECONDS)
+        return fields
     except Exception as e:
         raise ValueError(f"Failed to read PDF form fields: {str(e)}")
 
 
+def fill_pdf_bytes(
+    pdf_template: Union[str, bytes],
+    field_data: Dict[str, Any]
+) -> bytes:
+    """
+    Fill a PDF form in memory and return the filled PDF bytes.
+    
+    Fields not present in field_data keep whatever value the template
+    already holds, so passing an already-filled PDF applies a delta.
+    
+    Args:
+        pdf_template: Path to the PDF template, or the PDF bytes
+        field_data: Dictionary of {field_name: value} to fill
+    
+    Returns:
+        Filled PDF bytes
+    """
+    # Load the PDF form
+    with stage("pdf_fill"):
+        form = PdfWrapper(pdf_template)
+        
+        # Fill the form
+        # PyPDFForm expects a dict with field names as keys
+        form.fill(field_data)
+    
+    with stage("pdf_serialise"):
+        return bytes(form.read())
+
+
+def merge_pdfs(pdfs: List[bytes]) -> bytes:
+    """
+    Concatenate filled PDFs into one document, keeping their form fields.
+    
+    Args:
+        pdfs: PDF bytes in the order they should appear
+    
+    Returns:
+        Merged PDF bytes
+    """
+    merged = PdfWrapper(pdfs[0])
+    for pdf in pdfs[1:]:
+        merged = merged + PdfWrapper(pdf)
+    return bytes(merged.read())
+
+
 def fill_pdf_form(
     pdf_template_path: str,
     field_data: Dict[str, Any],
@@ -51,12 +111,7 @@ def fill_pdf_form(
         Path to the filled PDF file
     """
     try:
-        # Load the PDF form
-        form = PdfWrapper(pdf_template_path)
-        
-        # Fill the form
-        # PyPDFForm expects a dict with field names as keys
-        form.fill(field_data)
+        filled_pdf_bytes = fill_pdf_bytes(pdf_template_path, field_data)
         
         # Generate output path if not provided
         if output_path is None:
@@ -65,9 +120,6 @@ def fill_pdf_form(
             output_path = temp_file.name
             temp_file.close()
         
-        # Read the filled PDF bytes
-        filled_pdf_bytes = bytes(form.read())
-        
         # Write to output file
         with open(output_path, 'wb') as f:
             f.write(filled_pdf_bytes)
@@ -1,21 +1,88 @@
 import json
 import re
+from datetime import date
 from typing import Dict, List, Any
-from openai import OpenAI
 from ..core.config import settings
+from ..core.qwen import get_qwen_client
+from ..core.cache import shared_cache, make_key
+from ..core.hedging import qwen_hedger
+from ..core.circuit_breaker import qwen_breakers
+from ..core.profiling import stage
+from .field_matcher import match_fields, ambiguous_fields
 
-
-def get_qwen_client() -> OpenAI:
-    """Get OpenAI client configured for Qwen API."""
-    return OpenAI(
-        api_key=settings.QWEN_API_KEY,
-        base_url=settings.QWEN_API_ENDPOINT or "https://dashscope-intl.aliyuncs.com/compatible-mode/v1",
-    )
+MAPPING_MODEL = "qwen-plus"
 
 
 async def map_extracted_data_to_form_fields(
     extracted_data: Dict[str, Any],
     form_fields: List[str]
+) -> Dict[str, Any]:
+    """
+    Map extracted document data to PDF form fields.
+    
+    settings.FIELD_MAPPING_MODE picks the strategy:
+    - "llm": Qwen maps every field; the local matcher is only a fallback on errors
+    - "local": local fuzzy matcher only, no model call
+    - "local_first": local matcher first; Qwen is asked only about missing
+      fields that unused extracted data resembles, so most forms need no call
+    
+    Returns the same shape as map_with_llm. Error-free results are cached
+    across workers, keyed on the extracted data, form fields and mode.
+    """
+    mode = settings.FIELD_MAPPING_MODE
+    # Local matching fills today's date and ages, so results go stale at midnight
+    cache_key = make_key(mode, extracted_data, form_fields, date.today().isoformat())
+    cached = await shared_cache.aget("mapping", cache_key)
+    if cached is not None:
+        return cached
+    
+    result = await _map_with_mode(mode, extracted_data, form_fields)
+    if "error" not in result and "warning" not in result:
+        await shared_cache.aset("mapping", cache_key, result)
+    return result
+
+
+async def _map_with_mode(
+    mode: str,
+    extracted_data: Dict[str, Any],
+    form_fields: List[str]
+) -> Dict[str, Any]:
+    if mode == "llm":
+        result = await map_with_llm(extracted_data, form_fields)
+        if "error" in result:
+            local = match_fields(extracted_data, form_fields)
+            local["warning"] = f"AI mapping failed ({result['error']}); used local matcher"
+            return local
+        return result
+    
+    with stage("local_match"):
+        local = match_fields(extracted_data, form_fields)
+    if mode == "local":
+        return local
+    
+    uncertain = ambiguous_fields(extracted_data, local)
+    if not uncertain:
+        return local
+    
+    llm = await map_with_llm(extracted_data, uncertain)
+    if "error" in llm:
+        local["warning"] = f"AI mapping failed ({llm['error']}); used local matcher"
+        return local
+    
+    llm_filled = {
+        field: value for field, value in llm.get("filled_fields", {}).items()
+        if field in uncertain and value
+    }
+    return {
+        "mappings": local["mappings"] + llm.get("mappings", []),
+        "filled_fields": {**local["filled_fields"], **llm_filled},
+        "missing_fields": [f for f in local["missing_fields"] if f not in llm_filled],
+    }
+
+
+async def map_with_llm(
+    extracted_data: Dict[str, Any],
+    form_fields: List[str]
 ) -> Dict[str, Any]:
     """
     Use Qwen AI to intelligently map extracted document data to PDF form fields.
@@ -137,38 +204,46 @@ EXAMPLE OUTPUT:
 
 Return ONLY the JSON object, no explanations."""
 
-        completion = client.chat.completions.create(
-            model="qwen-plus",  # Using qwen-plus for reasoning
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that outputs valid JSON only."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.1,
-        )
-        
-        response_text = completion.choices[0].message.content
+        async def attempt() -> Dict[str, Any]:
+            async with stage("qwen_mapping"):
+                completion = await client.chat.completions.create(
+                    model=MAPPING_MODEL,  # Using qwen-plus for reasoning
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a helpful assistant that outputs valid JSON only."
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.1,
+                )
+            
+            response_text = completion.choices[0].message.content
+            
+            # Parse JSON from response
+            with stage("json_parse"):
+                json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
+                if json_match:
+                    return json.loads(json_match.group(1))
+                try:
+                    return json.loads(response_text)
+                except json.JSONDecodeError:
+                    # Fallback: return basic mapping
+                    return {
+                        "mappings": [],
+                        "filled_fields": {},
+                        "missing_fields": form_fields,
+                        "error": "Failed to parse AI response"
+                    }
         
-        # Parse JSON from response
-        json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
-        if json_match:
-            result = json.loads(json_match.group(1))
-        else:
-            try:
-                result = json.loads(response_text)
-            except json.JSONDecodeError:
-                # Fallback: return basic mapping
-                result = {
-                    "mappings": [],
-                    "filled_fields": {},
-                    "missing_fields": form_fields,
-                    "error": "Failed to parse AI response"
-                }
+        # A slow call is duplicated; the first parseable answer wins.
+        # While the breaker is open this fails fast and callers use the local matcher.
+        result = await qwen_breakers.get(MAPPING_MODEL).call(
+            lambda: qwen_hedger.run("mapping", attempt, lambda mapping: "error" not in mapping)
+        )
         
         return result
         
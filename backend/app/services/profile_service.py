@@ -0,0 +1,114 @@
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.resident_profile import ResidentProfile
+from ..models.submission import Submission
+from .field_matcher import QUALIFIERS, concept_of, normalize_field_name
+from .validation_service import validate_fields_locally
+
+logger = logging.getLogger(__name__)
+
+# Worked out at fill time, never stored
+VOLATILE_FIELDS = {"age", "date_today"}
+
+# Concepts an ID or civil document can supply; a form field outside these
+# is not worth a VL call
+DOCUMENT_CONCEPTS = {
+    "full_name", "first_name", "middle_name", "last_name", "suffix", "date_of_birth", "place_of_birth", "age",
+    "sex", "civil_status", "blood_type", "address", "barangay", "city", "province", "zip_code", "id_number",
+    "nationality",
+}
+
+
+async def get_profile(db: AsyncSession, user_id: int) -> Optional[ResidentProfile]:
+    """Retrieve a resident's profile, if they have one."""
+    result = await db.execute(select(ResidentProfile).where(ResidentProfile.user_id == user_id))
+    return result.scalar_one_or_none()
+
+
+def profile_fields(profile: ResidentProfile) -> Dict[str, Any]:
+    return json.loads(profile.fields or "{}")
+
+
+def profile_as_dict(profile: ResidentProfile) -> Dict[str, Any]:
+    return {
+        "user_id": profile.user_id,
+        "fields": profile_fields(profile),
+        "provenance": json.loads(profile.provenance or "{}"),
+        "source_submission_id": profile.source_submission_id,
+        "created_at": profile.created_at,
+        "updated_at": profile.updated_at,
+    }
+
+
+async def record_profile_from_submission(db: AsyncSession, submission: Submission) -> Optional[ResidentProfile]:
+    """
+    Add an approved submission's fields to the resident's profile without
+    committing; the caller commits it with the approval.
+
+    The first approved submission creates the profile. Later ones only
+    add fields the profile lacks, so confirmed values are never
+    overwritten. Each field records which submission it came from.
+
+    Returns:
+        The profile, or None if the submission has no usable data
+    """
+    try:
+        data = json.loads(submission.extracted_data or "{}")
+    except ValueError:
+        logger.warning("submission %s has unreadable extracted_data; profile not updated", submission.id)
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    normalised = validate_fields_locally(data)["fields"]
+    candidates = {
+        key: value for key, value in normalised.items()
+        if key not in VOLATILE_FIELDS and value not in (None, "") and not isinstance(value, (dict, list))
+    }
+    if not candidates:
+        return None
+
+    profile = await get_profile(db, submission.user_id)
+    if profile is None:
+        profile = ResidentProfile(user_id=submission.user_id, source_submission_id=submission.id)
+        db.add(profile)
+    fields = profile_fields(profile)
+    provenance = json.loads(profile.provenance or "{}")
+
+    confirmed_at = datetime.now(timezone.utc).isoformat()
+    for key, value in candidates.items():
+        if key in fields:
+            continue
+        fields[key] = value
+        provenance[key] = {
+            "submission_id": submission.id,
+            "form_type": submission.form_type,
+            "confirmed_at": confirmed_at,
+        }
+    profile.fields = json.dumps(fields)
+    profile.provenance = json.dumps(provenance)
+    return profile
+
+
+def fields_needing_extraction(missing_fields: List[str]) -> List[str]:
+    """
+    Form fields left empty by the profile that the resident's own document
+    could fill: only names the matcher resolves to a DOCUMENT_CONCEPTS
+    concept. Fields about someone else (emergency contact, mother, spouse,
+    ...) and names the matcher does not recognise are left for manual
+    entry rather than guessed from the resident's ID.
+    """
+    needed = []
+    for field in missing_fields:
+        name = normalize_field_name(field)
+        if any(token in name for token in QUALIFIERS):
+            continue
+        if concept_of(field) in DOCUMENT_CONCEPTS:
+            needed.append(field)
+    return needed
@@ -0,0 +1,66 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from typing import Optional
+
+from ..models.submission import Submission, SubmissionStatus
+from .notification_service import enqueue_notification, is_notification_queued
+from .profile_service import record_profile_from_submission
+
+STATUS_EVENTS = {
+    SubmissionStatus.APPROVED: "submission_approved",
+    SubmissionStatus.CORRECTION_REQUESTED: "submission_correction_requested",
+    SubmissionStatus.REJECTED: "submission_rejected",
+}
+
+
+async def get_submission_by_id(db: AsyncSession, submission_id: int) -> Optional[Submission]:
+    """Retrieve a submission (with its user) by ID."""
+    result = await db.execute(
+        select(Submission).options(selectinload(Submission.user)).where(Submission.id == submission_id)
+    )
+    return result.scalar_one_or_none()
+
+
+async def update_submission_status(
+    db: AsyncSession, submission_id: int, status: SubmissionStatus, note: str = ""
+) -> Submission:
+    """
+    Set a submission's review status (admin action) and queue the
+    resident's notification in the same commit. Approval also records the
+    submission's fields in the resident's profile. Setting the status it
+    already has is a no-op, and the notification key is derived from the
+    transition, so a repeated request never notifies twice.
+    Returns the updated submission.
+    Raises ValueError if submission not found.
+    """
+    submission = await get_submission_by_id(db, submission_id)
+    if not submission:
+        raise ValueError("Submission not found")
+
+    old_status = submission.status
+    if old_status == status.value:
+        return submission
+
+    submission.status = status.value
+    if status == SubmissionStatus.APPROVED:
+        await record_profile_from_submission(db, submission)
+    event = STATUS_EVENTS.get(status)
+    idempotency_key = f"{event}:{submission.id}:{old_status}->{status.value}"
+    # The same transition again (e.g. APPROVED -> PENDING -> APPROVED) was already announced
+    if event and not await is_notification_queued(db, idempotency_key):
+        enqueue_notification(
+            db,
+            user_id=submission.user_id,
+            recipient=submission.user.email,
+            event=event,
+            payload={
+                "name": submission.user.name,
+                "form_type": submission.form_type,
+                "submission_id": submission.id,
+                "note": note,
+            },
+            idempotency_key=idempotency_key,
+        )
+    await db.commit()
+    return submission
@@ -0,0 +1,392 @@
+import json
+import re
+from datetime import date
+from typing import Dict, Any, Optional, Tuple
+
+from ..core.config import settings
+
+# Confidence assigned to a value after local checks. Anything below
+# settings.VALIDATION_REVIEW_THRESHOLD is sent to the LLM for review.
+CONFIDENT = 1.0
+PLAUSIBLE = 0.8
+SUSPICIOUS = 0.4
+
+NULL_VALUES = {"", "n/a", "na", "none", "null", "not available", "not present", "-", "--"}
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3,
+    "apr": 4, "april": 4, "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7,
+    "aug": 8, "august": 8, "sep": 9, "sept": 9, "september": 9, "oct": 10, "october": 10,
+    "nov": 11, "november": 11, "dec": 12, "december": 12,
+}
+
+SEX_VALUES = {
+    "m": "Male", "male": "Male", "lalaki": "Male", "man": "Male",
+    "f": "Female", "female": "Female", "babae": "Female", "woman": "Female",
+}
+
+# Philippine ID number formats, as digit-group lengths, keyed by ID type
+ID_FORMATS = {
+    "philsys_psn": (4, 4, 4, 4),    # PhilSys Number 1234-5678-9012-3456
+    "philsys_pcn": (4, 4, 4, 4),
+    "umid_crn": (4, 7, 1),          # 0111-1234567-8
+    "sss": (2, 7, 1),               # 12-3456789-0
+    "philhealth": (2, 9, 1),        # 12-345678901-2
+    "tin": (3, 3, 3, 3),            # 123-456-789-000
+    "tin_short": (3, 3, 3),         # 123-456-789
+    "pagibig": (4, 4, 4),           # 1234-5678-9012
+}
+# Key tokens that name the ID type, so same-length formats can be told apart
+ID_KEY_FORMATS = {
+    "psn": ("philsys_psn",), "pcn": ("philsys_pcn",), "philsys": ("philsys_psn", "philsys_pcn"),
+    "umid": ("umid_crn",), "crn": ("umid_crn",),
+    "sss": ("sss",),
+    "philhealth": ("philhealth",), "pin": ("philhealth",),
+    "tin": ("tin", "tin_short"),
+    "pagibig": ("pagibig",), "hdmf": ("pagibig",), "mid": ("pagibig",),
+}
+DRIVERS_LICENSE = re.compile(r"^([A-Z])(\d{2})-?(\d{2})-?(\d{6})$")
+
+ZIP_CODE = re.compile(r"\b(\d{4})\s*(?:,?\s*philippines)?\s*$", re.IGNORECASE)
+BARANGAY = re.compile(r"\b(?:barangay|brgy\.?|bgy\.?)\s+([^,]+)", re.IGNORECASE)
+CITY = re.compile(r"(?:\bcity of\s+([^,]+))|(?:([^,]+?)\s+city\b)", re.IGNORECASE)
+MUNICIPALITY = re.compile(r"\b(?:municipality of|mun\.? of)\s+([^,]+)", re.IGNORECASE)
+PROVINCE = re.compile(r"\bprovince of\s+([^,]+)", re.IGNORECASE)
+
+
+DATE_TOKENS = {"date", "birthday", "birthdate", "dob", "issued", "until", "expiry", "expiration", "expires"}
+# Key tokens that name an ID type outright; "mid" and "pin" only count next to "number"/"no"
+ID_TYPE_TOKENS = set(ID_KEY_FORMATS) - {"mid", "pin"}
+ID_NUMBER_PREFIXES = {"id", "license", "mid", "pin"}
+
+
+def _key_tokens(key: Optional[str]) -> set:
+    """A field name's whole words: "pag_ibig_mid_no" -> {"pagibig", "mid", "no"}."""
+    name = (key or "").lower().replace("pag_ibig", "pagibig").replace("phil_health", "philhealth")
+    return set(re.split(r"[^a-z]+", name)) - {""}
+
+
+def _field_kind(key: str) -> Optional[str]:
+    """
+    Guess what kind of value an extracted key holds from the whole words of
+    its name. "email_address" is not an address and "issued_by" names an
+    authority, not a date.
+    """
+    name = key.lower()
+    tokens = _key_tokens(key)
+    describes_other = "email" in tokens or name.endswith("_by")
+    if tokens & DATE_TOKENS and not describes_other:
+        return "date"
+    if tokens & {"sex", "gender"}:
+        return "sex"
+    if "address" in tokens and not describes_other:
+        return "address"
+    if tokens & ID_TYPE_TOKENS or (tokens & ID_NUMBER_PREFIXES and tokens & {"number", "no", "num"}):
+        return "id_number"
+    if name.endswith("name") and "maiden" not in name:
+        return "name"
+    return None
+
+
+def normalize_date(value: str) -> Tuple[Optional[str], float, Optional[str]]:
+    """
+    Canonicalise a date to YYYY-MM-DD.
+
+    Numeric dates are read month-first (MM/DD/YYYY) as on Philippine IDs,
+    unless the first number can only be a day.
+
+    Returns:
+        Tuple of (canonical_value, confidence, issue)
+    """
+    text = re.sub(r"\s+", " ", value.strip().replace(",", " ")).strip()
+    parsed: Optional[date] = None
+    confidence = CONFIDENT
+
+    iso = re.fullmatch(r"(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})", text)
+    numeric = re.fullmatch(r"(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})", text)
+    if iso:
+        year, month, day = (int(g) for g in iso.groups())
+        parsed = _safe_date(year, month, day)
+    elif numeric:
+        first, second, year = (int(g) for g in numeric.groups())
+        if first > 12:
+            parsed = _safe_date(year, second, first)
+        else:
+            parsed = _safe_date(year, first, second)
+            if second <= 12 and first != second:
+                # 03/04/1990 could be either order
+                confidence = PLAUSIBLE
+    else:
+        words = text.lower().replace(".", "").split(" ")
+        numbers = [int(w) for w in words if w.isdigit()]
+        months = [MONTHS[w] for w in words if w in MONTHS]
+        if len(months) == 1 and len(numbers) == 2:
+            parsed = _safe_date(max(numbers), months[0], min(numbers))
+
+    if parsed is None:
+        return value, SUSPICIOUS, "unrecognised date format"
+    if parsed.year < 1900:
+        return parsed.isoformat(), SUSPICIOUS, "year before 1900"
+    if parsed > date.today():
+        return parsed.isoformat(), SUSPICIOUS, "date is in the future"
+    return parsed.isoformat(), confidence, None
+
+
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def normalize_sex(value: str) -> Tuple[Optional[str], float, Optional[str]]:
+    canonical = SEX_VALUES.get(value.strip().lower().rstrip("."))
+    if canonical is None:
+        return value, SUSPICIOUS, "unrecognised sex value"
+    return canonical, CONFIDENT, None
+
+
+def _id_formats_for_key(key: Optional[str]) -> Dict[str, Tuple[int, ...]]:
+    """The ID formats a field could hold, narrowed by its name when the name says the ID type."""
+    tokens = _key_tokens(key)
+    names = {name for token in tokens & ID_KEY_FORMATS.keys() for name in ID_KEY_FORMATS[token]}
+    return {name: groups for name, groups in ID_FORMATS.items() if not names or name in names}
+
+
+def normalize_id_number(value: str, key: Optional[str] = None) -> Tuple[Optional[str], float, Optional[str]]:
+    """
+    Canonicalise hyphenation of known Philippine ID number formats.
+
+    Several formats share a digit count (UMID CRN, PhilHealth, TIN and
+    Pag-IBIG all have 12), so digits are only regrouped when the field
+    name or the length pins down one grouping. A value already written in
+    a valid grouping is kept; an ambiguous bare number is returned as
+    written, flagged for review rather than guessed.
+    """
+    stripped = value.strip().upper()
+    compact = re.sub(r"[\s\-.]", "", stripped)
+
+    license_match = DRIVERS_LICENSE.match(compact)
+    if license_match:
+        return "{}{}-{}-{}".format(*license_match.groups()), CONFIDENT, None
+
+    if not compact.isdigit():
+        return value.strip(), SUSPICIOUS, "ID number contains unexpected characters"
+
+    formats = _id_formats_for_key(key)
+    written = [part for part in re.split(r"[\s\-.]+", stripped) if part]
+    if len(written) > 1 and tuple(len(part) for part in written) in formats.values():
+        return "-".join(written), CONFIDENT, None
+
+    groupings = {groups for groups in formats.values() if sum(groups) == len(compact)}
+    if len(groupings) == 1:
+        parts, start = [], 0
+        for size in groupings.pop():
+            parts.append(compact[start:start + size])
+            start += size
+        return "-".join(parts), CONFIDENT, None
+    if groupings:
+        return value.strip(), SUSPICIOUS, "ID number length fits several ID types; grouping left as written"
+
+    return compact, SUSPICIOUS, "ID number does not match a known format"
+
+
+def normalize_name(value: str) -> Tuple[Optional[str], float, Optional[str]]:
+    """Turn "DELA CRUZ, JUAN" into "Juan Dela Cruz"; title-case all-caps names."""
+    text = re.sub(r"\s+", " ", value.strip())
+    if text.count(",") == 1:
+        last, first = (part.strip() for part in text.split(","))
+        if last and first:
+            text = f"{first} {last}"
+    if text.isupper():
+        text = " ".join(_title_word(word) for word in text.split(" "))
+    if re.search(r"\d", text):
+        return text, SUSPICIOUS, "name contains digits"
+    return text, CONFIDENT, None
+
+
+def _title_word(word: str) -> str:
+    # Keep suffixes like "III" / "JR." readable
+    if word.rstrip(".") in ("II", "III", "IV", "V"):
+        return word
+    return word.capitalize()
+
+
+def parse_address(value: str) -> Tuple[str, Dict[str, str], float, Optional[str]]:
+    """
+    Normalise an address and pull out barangay, city/municipality, province and ZIP.
+
+    Returns:
+        Tuple of (address, components, confidence, issue)
+    """
+    address = re.sub(r"\s+", " ", value.strip()).strip(", ")
+    if address.isupper():
+        address = address.title()
+
+    components: Dict[str, str] = {}
+    match = BARANGAY.search(address)
+    if match:
+        components["barangay"] = match.group(1).strip()
+    match = MUNICIPALITY.search(address)
+    if match:
+        components["municipality"] = match.group(1).strip()
+    else:
+        match = CITY.search(address)
+        if match:
+            if match.group(1):
+                components["city"] = f"City of {match.group(1).strip()}"
+            else:
+                components["city"] = f"{match.group(2).strip()} City"
+    match = PROVINCE.search(address)
+    if match:
+        components["province"] = match.group(1).strip()
+    match = ZIP_CODE.search(address)
+    if match:
+        components["zip_code"] = match.group(1)
+
+    if "," not in address and len(address.split(" ")) < 3:
+        return address, components, SUSPICIOUS, "address looks incomplete"
+    if not components:
+        return address, components, PLAUSIBLE, None
+    return address, components, CONFIDENT, None
+
+
+def validate_fields_locally(extracted_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Deterministically canonicalise extracted fields and flag suspicious ones.
+
+    Args:
+        extracted_data: Output of extract_fields_from_document
+
+    Returns:
+        {
+            "fields": {...normalised fields, plus derived address components...},
+            "confidence": {"date_of_birth": 1.0, ...},
+            "issues": {"id_number": "ID number does not match a known format", ...}
+        }
+    """
+    fields: Dict[str, Any] = {}
+    confidence: Dict[str, float] = {}
+    issues: Dict[str, str] = {}
+    derived: Dict[str, str] = {}
+
+    for key, value in extracted_data.items():
+        if not isinstance(value, str):
+            fields[key] = value
+            continue
+        if value.strip().lower() in NULL_VALUES:
+            fields[key] = None
+            continue
+
+        kind = _field_kind(key)
+        issue = None
+        if kind == "date":
+            normalized, score, issue = normalize_date(value)
+            if issue == "date is in the future" and any(t in key.lower() for t in ("valid", "expir")):
+                score, issue = CONFIDENT, None
+        elif kind == "sex":
+            normalized, score, issue = normalize_sex(value)
+        elif kind == "id_number":
+            normalized, score, issue = normalize_id_number(value, key)
+        elif kind == "name":
+            normalized, score, issue = normalize_name(value)
+        elif kind == "address":
+            normalized, components, score, issue = parse_address(value)
+            for component, component_value in components.items():
+                derived.setdefault(component, component_value)
+        else:
+            normalized, score = re.sub(r"\s+", " ", value.strip()), CONFIDENT
+
+        fields[key] = normalized
+        confidence[key] = score
+        if issue:
+            issues[key] = issue
+
+    # Derived components never overwrite what the model extracted itself
+    for key, value in derived.items():
+        if not fields.get(key):
+            fields[key] = value
+            confidence[key] = PLAUSIBLE
+
+    return {"fields": fields, "confidence": confidence, "issues": issues}
+
+
+async def review_fields_with_llm(fields: Dict[str, Any], issues: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Ask qwen-plus to correct only the fields local validation was unsure about.
+
+    Returns:
+        Dict of {field_name: corrected_value}; empty on any failure
+    """
+    from ..core.circuit_breaker import qwen_breakers
+    from .pdf_mapping_service import get_qwen_client, MAPPING_MODEL
+
+    prompt = f"""These values were extracted by OCR from a Philippine ID or civil document and failed validation.
+Correct each value if the intended value is clear, otherwise return it unchanged. Use null if it is clearly not a real value.
+Dates must be YYYY-MM-DD. Sex must be "Male" or "Female".
+
+FIELDS AND PROBLEMS:
+{json.dumps({key: {"value": fields[key], "problem": issues[key]} for key in issues}, indent=2)}
+
+Return ONLY a JSON object of field_name -> corrected value."""
+
+    try:
+        client = get_qwen_client()
+        # Skipped (fields kept as normalised locally) while the breaker is open
+        completion = await qwen_breakers.get(MAPPING_MODEL).call(lambda: client.chat.completions.create(
+            model=MAPPING_MODEL,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant that outputs valid JSON only."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.1,
+        ))
+        response_text = completion.choices[0].message.content
+        json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
+        corrected = json.loads(json_match.group(1) if json_match else response_text)
+        if not isinstance(corrected, dict):
+            return {}
+        return {key: value for key, value in corrected.items() if key in issues}
+    except Exception:
+        return {}
+
+
+async def validate_extracted_fields(extracted_data: Dict[str, Any], llm_review: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Validate and normalise extraction output, escalating only the
+    low-confidence subset to the LLM.
+
+    Args:
+        extracted_data: Output of extract_fields_from_document
+        llm_review: Override settings.VALIDATION_LLM_REVIEW
+
+    Returns:
+        Same shape as validate_fields_locally, plus "reviewed": list of
+        field names whose values came back from the LLM review.
+    """
+    result = validate_fields_locally(extracted_data)
+    result["reviewed"] = []
+
+    if llm_review is None:
+        llm_review = settings.VALIDATION_LLM_REVIEW
+    to_review = {
+        key: issue for key, issue in result["issues"].items()
+        if result["confidence"].get(key, CONFIDENT) < settings.VALIDATION_REVIEW_THRESHOLD
+    }
+    if not llm_review or not to_review:
+        return result
+
+    corrected = await review_fields_with_llm(result["fields"], to_review)
+    if not corrected:
+        return result
+
+    recheck = validate_fields_locally(corrected)
+    for key in corrected:
+        result["fields"][key] = recheck["fields"].get(key)
+        result["confidence"][key] = recheck["confidence"].get(key, PLAUSIBLE)
+        if key in recheck["issues"]:
+            result["issues"][key] = recheck["issues"][key]
+        else:
+            result["issues"].pop(key, None)
+        result["reviewed"].append(key)
+    return result
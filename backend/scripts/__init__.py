@@ -0,0 +1 @@
+# empty to mark package
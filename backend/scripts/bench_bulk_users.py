@@ -0,0 +1,106 @@
+"""
+Throughput benchmark for bulk resident onboarding.
+
+Compares, on a throwaway SQLite database:
+- CSV import (streamed, parallel hashing, batched inserts) vs register_user per row
+- bulk_verify_users (one UPDATE) vs verify_user per user
+
+Run from the backend directory (needs aiosqlite):
+
+    python -m scripts.bench_bulk_users --rows 2000 --bcrypt-rounds 4
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+
+def make_csv(rows: int, duplicate_every: int) -> str:
+    out = io.StringIO()
+    out.write("email,name,password\n")
+    for i in range(rows):
+        n = i - 1 if duplicate_every and i and i % duplicate_every == 0 else i
+        out.write(f"resident{n}@example.com,Resident {n},password-{n}\n")
+    return out.getvalue()
+
+
+async def run(args) -> None:
+    from passlib.context import CryptContext
+
+    from app.core import security
+    from app.core.db import Base
+    from app.models import user, notification  # noqa: F401
+    from app.models.user import User
+    from app.services import auth_service
+
+    # Production cost is passlib's default (12); lower it to keep the run short
+    if args.bcrypt_rounds:
+        security.pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.bcrypt_rounds)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+        csv_text = make_csv(args.rows, args.duplicate_every)
+        async with session_factory() as db:
+            start = time.perf_counter()
+            summary = await auth_service.import_users_from_csv(
+                db, io.StringIO(csv_text, newline=""), batch_size=args.batch_size
+            )
+            bulk_import = time.perf_counter() - start
+        print(f"bulk import:    {summary['created']} created, {len(summary['duplicates'])} duplicates "
+              f"in {bulk_import:.2f}s ({summary['created'] / bulk_import:.0f} rows/s)")
+
+        sample = min(args.rows, args.sequential_sample)
+        async with session_factory() as db:
+            start = time.perf_counter()
+            for i in range(sample):
+                await auth_service.register_user(db, f"single{i}@example.com", f"password-{i}", f"Single {i}")
+            sequential = time.perf_counter() - start
+        print(f"register_user:  {sample} created in {sequential:.2f}s ({sample / sequential:.0f} rows/s)")
+
+        async with session_factory() as db:
+            ids: List[int] = list((await db.execute(select(User.id))).scalars())
+        half = len(ids) // 2
+
+        async with session_factory() as db:
+            start = time.perf_counter()
+            updated = await auth_service.bulk_verify_users(db, ids[:half])
+            bulk_verify = time.perf_counter() - start
+        print(f"bulk verify:    {updated} users in {bulk_verify * 1000:.0f}ms ({updated / bulk_verify:.0f} users/s)")
+
+        sample_ids = ids[half:half + args.sequential_sample]
+        async with session_factory() as db:
+            start = time.perf_counter()
+            for user_id in sample_ids:
+                await auth_service.verify_user(db, user_id)
+            single_verify = time.perf_counter() - start
+        print(f"verify_user:    {len(sample_ids)} users in {single_verify * 1000:.0f}ms "
+              f"({len(sample_ids) / single_verify:.0f} users/s)")
+
+        await engine.dispose()
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark bulk resident import and verification.")
+    parser.add_argument("--rows", type=int, default=2000, help="Rows in the generated CSV")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--duplicate-every", type=int, default=50, help="Repeat an email every N rows (0 = never)")
+    parser.add_argument("--sequential-sample", type=int, default=100, help="Rows/users for the one-at-a-time baselines")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4, help="bcrypt cost; 0 keeps the production default")
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
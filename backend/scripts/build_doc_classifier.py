@@ -0,0 +1,78 @@
+"""
+Build the document-type classifier index from labelled example images.
+
+Expects one folder per type under <examples>/documents (the layout
+scripts.gen_corpus writes; real, consented samples can be added the same
+way): national_id, drivers_license, birth_certificate, other. Holds out
+a share of the examples to report accuracy, then fits on all of them and
+writes the index that DOC_CLASSIFIER_INDEX_PATH points at.
+
+Run from the backend directory:
+
+    python -m scripts.gen_corpus --out /tmp/corpus --documents 800 --forms 0
+    python -m scripts.build_doc_classifier --examples /tmp/corpus --out doc_classifier.npz
+"""
+import argparse
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from app.services.document_classifier import DOCUMENT_TYPES, DocumentClassifier, extract_features
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Build the document-type classifier index.")
+    parser.add_argument("--examples", required=True, help="Directory containing documents/<type>/ image folders")
+    parser.add_argument("--out", required=True, help="Index file to write (.npz)")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of examples held out for the accuracy report")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=2025)
+    args = parser.parse_args(argv)
+
+    features, labels = [], []
+    start = time.perf_counter()
+    for label in DOCUMENT_TYPES:
+        folder = Path(args.examples) / "documents" / label
+        for path in sorted(folder.glob("*")) if folder.is_dir() else []:
+            if path.suffix.lower() not in IMAGE_SUFFIXES:
+                continue
+            vector = extract_features(path.read_bytes())
+            if vector is not None:
+                features.append(vector)
+                labels.append(label)
+    if not features:
+        print(f"no labelled images under {args.examples}/documents/<type>/", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+    print(f"{len(features)} examples {dict(Counter(labels))}, features in {elapsed / len(features) * 1000:.1f}ms each")
+
+    order = list(range(len(features)))
+    random.Random(args.seed).shuffle(order)
+    cut = int(len(order) * (1 - args.holdout))
+    if args.holdout and 0 < cut < len(order):
+        train, test = order[:cut], order[cut:]
+        classifier = DocumentClassifier(np.stack([features[i] for i in train]), [labels[i] for i in train], k=args.k)
+        confusion = Counter()
+        for i in test:
+            confusion[(labels[i], classifier.predict(features[i])[0])] += 1
+        correct = sum(n for (truth, predicted), n in confusion.items() if truth == predicted)
+        print(f"holdout accuracy {correct / len(test):.1%} on {len(test)}")
+        for (truth, predicted), n in sorted(confusion.items()):
+            if truth != predicted:
+                print(f"  {truth} -> {predicted}: {n}")
+
+    classifier = DocumentClassifier(np.stack(features), labels, k=args.k)
+    classifier.save(args.out)
+    print(f"wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
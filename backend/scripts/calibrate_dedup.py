@@ -0,0 +1,130 @@
+"""
+Calibrate the near-duplicate upload thresholds on a document corpus.
+
+For each document, re-captures of the same document are simulated
+(downscaled and recompressed, rotated +-2 degrees, cropped 3%, darker,
+reframed on another background) and compared with the original; every
+pair of different documents of the same type is compared too. Prints the
+pHash distance and match_score distributions of both groups and the
+PHASH_MAX_DISTANCE / PHASH_MIN_MATCH_SCORE they suggest.
+
+Run from the backend directory:
+
+    python -m scripts.gen_corpus --out /tmp/corpus --documents 400 --forms 0
+    python -m scripts.calibrate_dedup --examples /tmp/corpus --per-type 24
+"""
+import argparse
+import io
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.services.document_classifier import DOCUMENT_TYPES
+from app.services.document_dedup_service import document_fingerprint, match_score
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def _jpeg(image: Image.Image, quality: int = 85) -> bytes:
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def _reframe(image: Image.Image, rng: random.Random) -> bytes:
+    margin = int(max(image.size) * 0.12)
+    canvas = Image.new("RGB", (image.width + 2 * margin, image.height + 2 * margin), (rng.randrange(60, 140),) * 3)
+    canvas.paste(image, (margin, margin))
+    left, top, right, bottom = (rng.randrange(0, margin - 4) for _ in range(4))
+    framed = canvas.crop((left, top, canvas.width - right, canvas.height - bottom))
+    return _jpeg(framed.rotate(rng.uniform(-3, 3), expand=True, fillcolor=(100, 100, 100)))
+
+
+def recaptures(image_bytes: bytes, rng: random.Random) -> Dict[str, bytes]:
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    w, h = image.size
+    variants: Dict[str, Callable[[], bytes]] = {
+        "downscaled_q40": lambda: _jpeg(image.resize((w // 2, h // 2)), 40),
+        "rotated+2": lambda: _jpeg(image.rotate(2, expand=True, fillcolor=(90, 90, 90))),
+        "rotated-2": lambda: _jpeg(image.rotate(-2, expand=True, fillcolor=(70, 70, 70))),
+        "cropped3": lambda: _jpeg(image.crop((int(w * 0.03), int(h * 0.03), int(w * 0.97), int(h * 0.97)))),
+        "darker": lambda: _jpeg(image.point(lambda v: int(v * 0.85))),
+        "reframed": lambda: _reframe(image, rng),
+    }
+    return {name: make() for name, make in variants.items()}
+
+
+def _percentiles(values: List[float], points=(0, 5, 50, 95, 100)) -> str:
+    return " ".join(f"p{p}={np.percentile(values, p):.2f}" for p in points)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Calibrate near-duplicate upload thresholds.")
+    parser.add_argument("--examples", required=True, help="Directory containing documents/<type>/ image folders")
+    parser.add_argument("--per-type", type=int, default=24, help="Documents used per type")
+    parser.add_argument("--margin", type=float, default=0.25, help="Score margin kept above the closest different pair")
+    parser.add_argument("--seed", type=int, default=2025)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    same_scores, same_distances, different_scores = [], [], []
+    compare_seconds, comparisons = 0.0, 0
+    for label in DOCUMENT_TYPES:
+        if label == "other":
+            continue
+        folder = Path(args.examples) / "documents" / label
+        paths = [p for p in sorted(folder.glob("*")) if p.suffix.lower() in IMAGE_SUFFIXES] if folder.is_dir() else []
+        paths = paths[:args.per_type]
+        originals = [(path, document_fingerprint(path.read_bytes())) for path in paths]
+        originals = [(path, fp) for path, fp in originals if fp is not None]
+
+        for path, original in originals:
+            for name, variant in recaptures(path.read_bytes(), rng).items():
+                fingerprint = document_fingerprint(variant)
+                if fingerprint is None:
+                    continue
+                start = time.perf_counter()
+                score = match_score(original, fingerprint)
+                compare_seconds += time.perf_counter() - start
+                comparisons += 1
+                same_scores.append(score)
+                same_distances.append((original.phash ^ fingerprint.phash).bit_count())
+                if score < settings.PHASH_MIN_MATCH_SCORE:
+                    print(f"  {label} {path.name} {name}: {score:.2f}")
+
+        worst = -1.0
+        for i in range(len(originals)):
+            for j in range(i + 1, len(originals)):
+                start = time.perf_counter()
+                score = match_score(originals[i][1], originals[j][1])
+                compare_seconds += time.perf_counter() - start
+                comparisons += 1
+                different_scores.append(score)
+                worst = max(worst, score)
+        print(f"{label}: {len(originals)} documents, closest different pair {worst:.2f}")
+
+    if not same_scores or not different_scores:
+        print(f"no labelled images under {args.examples}/documents/<type>/", file=sys.stderr)
+        return 1
+
+    print(f"match_score same document      {_percentiles(same_scores)} ({len(same_scores)} pairs)")
+    print(f"match_score different document {_percentiles(different_scores)} ({len(different_scores)} pairs)")
+    print(f"pHash distance same document   {_percentiles(same_distances)}")
+    print(f"{compare_seconds / comparisons * 1000:.0f}ms per match_score")
+
+    min_score = round(max(different_scores) + args.margin, 2)
+    max_distance = int(np.percentile(same_distances, 95))
+    accepted = np.mean([s >= min_score for s, d in zip(same_scores, same_distances) if d <= max_distance])
+    print(f"suggested PHASH_MIN_MATCH_SCORE={min_score} PHASH_MAX_DISTANCE={max_distance}")
+    print(f"  -> {accepted:.1%} of shortlisted re-captures confirmed, no different pair above {min_score - args.margin:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
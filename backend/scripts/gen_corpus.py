@@ -0,0 +1,372 @@
+"""
+Synthetic document and form corpus for scale testing.
+
+Renders ID cards, driver's licences and birth certificates with Pillow at
+several resolutions, each with a ground-truth JSON of the values drawn on
+it (in the canonical form validation_service produces), and writes
+fillable PDF forms with a configurable number of fields and _2/_3
+numbered-variant density. Receipts, letters and snapshots are rendered
+as "other" so the document classifier has negatives to learn from.
+Nothing in it is real resident data.
+
+Run from the backend directory:
+
+    python -m scripts.gen_corpus --out /tmp/corpus --documents 200 --forms 20 --fields 50,200,1000
+
+Layout:
+    <out>/documents/<kind>/<name>.jpg + <name>.json
+    <out>/forms/form_<fields>f_<n>.pdf + .json (field names)
+    <out>/manifest.json
+"""
+import argparse
+import json
+import random
+import sys
+import textwrap
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+FIRST_NAMES = ["Juan", "Maria", "Jose", "Ana", "Pedro", "Rosa", "Mark", "Kristine", "John Paul", "Mary Grace",
+               "Angelo", "Jasmine", "Ramon", "Luzviminda", "Emmanuel", "Liza", "Rodel", "Cherry", "Noel", "Divina"]
+MIDDLE_NAMES = ["Santos", "Reyes", "Garcia", "Mendoza", "Bautista", "Villanueva", "Ramos", "Aquino", "Castillo",
+                "Flores", "Navarro", "Torres"]
+LAST_NAMES = ["Dela Cruz", "Santos", "Reyes", "Cruz", "Bautista", "Del Rosario", "Gonzales", "Lopez", "De Leon",
+              "Mercado", "San Juan", "Pascual", "Soriano", "Manalo", "Aguilar"]
+STREETS = ["Mabuhay Street", "Rizal Avenue", "Bonifacio Street", "Mabini Street", "Luna Street", "Sampaguita Lane",
+           "Narra Street", "Acacia Road"]
+CITIES = [("Quezon City", "Metro Manila", "1100"), ("Pasig City", "Metro Manila", "1600"),
+          ("Cebu City", "Cebu", "6000"), ("Davao City", "Davao del Sur", "8000"),
+          ("Iloilo City", "Iloilo", "5000"), ("Baguio City", "Benguet", "2600")]
+BIRTHPLACES = ["Manila", "Quezon City", "Cebu City", "Davao City", "Iloilo City", "Tacloban City", "Baguio City"]
+
+DOCUMENT_KINDS = ("national_id", "drivers_license", "birth_certificate", "other")
+
+# Base form field names the generator draws from; variants get _2, _3, ...
+FORM_FIELD_BASES = [
+    "firstname", "middlename", "last_name", "suffix", "fullname", "birthday", "birthplace", "age", "gender",
+    "civil_status", "complete_address", "barangay", "city", "province", "zip_code", "cellphone_no", "email",
+    "occupation", "nationality", "id_number", "date_today", "mothers_maiden_name", "emergency_contact_fullname",
+    "emergency_contact_contact_no", "emergency_contact_relationship", "purpose", "remarks",
+]
+
+
+def _font(size: int) -> ImageFont.ImageFont:
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def random_person(rng: random.Random) -> Dict[str, str]:
+    first = rng.choice(FIRST_NAMES)
+    middle = rng.choice(MIDDLE_NAMES)
+    last = rng.choice(LAST_NAMES)
+    city, province, zip_code = rng.choice(CITIES)
+    born = date(1940, 1, 1) + timedelta(days=rng.randrange(0, 365 * 65))
+    address = f"{rng.randrange(1, 999)} {rng.choice(STREETS)}, Barangay {rng.randrange(1, 200)}, {city}, {province} {zip_code}"
+    return {
+        "first_name": first,
+        "middle_name": middle,
+        "last_name": last,
+        "full_name": f"{first} {middle} {last}",
+        "date_of_birth": born.isoformat(),
+        "sex": rng.choice(["Male", "Female"]),
+        "address": address,
+        "place_of_birth": rng.choice(BIRTHPLACES),
+    }
+
+
+def _psn(rng: random.Random) -> str:
+    return "-".join(f"{rng.randrange(0, 10000):04d}" for _ in range(4))
+
+
+def _license_no(rng: random.Random) -> str:
+    return f"{rng.choice('ABCDEFGHKN')}{rng.randrange(0, 100):02d}-{rng.randrange(0, 100):02d}-{rng.randrange(0, 1000000):06d}"
+
+
+def _long_date(iso: str) -> str:
+    return date.fromisoformat(iso).strftime("%d %B %Y").upper()
+
+
+def render_card(kind: str, person: Dict[str, str], width: int, rng: random.Random) -> Tuple[Image.Image, Dict[str, Any]]:
+    """ID-1 sized card (85.6 x 54 mm) with header band, photo box and labelled fields."""
+    height = int(width / 1.586)
+    s = width / 1000  # layout is designed at 1000 px wide
+    if kind == "national_id":
+        background, band, title = (236, 242, 250), (30, 72, 140), "PHILIPPINE IDENTIFICATION CARD"
+        number_label, number = "PhilSys Card Number", _psn(rng)
+    else:
+        background, band, title = (245, 240, 225), (20, 110, 60), "DRIVER'S LICENSE"
+        number_label, number = "License No.", _license_no(rng)
+
+    image = Image.new("RGB", (width, height), background)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, width, int(120 * s)], fill=band)
+    draw.text((int(30 * s), int(15 * s)), "REPUBLIC OF THE PHILIPPINES", fill="white", font=_font(int(30 * s)))
+    draw.text((int(30 * s), int(60 * s)), title, fill="white", font=_font(int(40 * s)))
+    draw.rectangle([int(30 * s), int(150 * s), int(280 * s), int(450 * s)], fill=(200, 200, 205), outline=(90, 90, 90))
+
+    rows = [
+        (number_label, number),
+        ("Last Name", person["last_name"].upper()),
+        ("Given Names", f"{person['first_name']}".upper()),
+        ("Middle Name", person["middle_name"].upper()),
+        ("Date of Birth", _long_date(person["date_of_birth"])),
+        ("Sex", person["sex"].upper()),
+        ("Address", person["address"].upper()),
+    ]
+    y = int(140 * s)
+    label_font, value_font = _font(int(18 * s)), _font(int(28 * s))
+    for label, value in rows:
+        draw.text((int(310 * s), y), label, fill=(90, 90, 90), font=label_font)
+        draw.multiline_text((int(310 * s), y + int(20 * s)), "\n".join(textwrap.wrap(value, 40)),
+                            fill=(10, 10, 10), font=value_font, spacing=int(4 * s))
+        y += int(62 * s)
+
+    truth = {**{k: person[k] for k in ("full_name", "first_name", "middle_name", "last_name",
+                                        "date_of_birth", "sex", "address")},
+             "id_number": number}
+    return image, truth
+
+
+def render_birth_certificate(person: Dict[str, str], width: int, rng: random.Random) -> Tuple[Image.Image, Dict[str, Any]]:
+    """A4 portrait certificate with a boxed field grid."""
+    height = int(width * 1.414)
+    s = width / 1000
+    image = Image.new("RGB", (width, height), (250, 248, 240))
+    draw = ImageDraw.Draw(image)
+    center = width // 2
+    for text, y, size in (("Republic of the Philippines", 40, 24), ("OFFICE OF THE CIVIL REGISTRAR GENERAL", 75, 28),
+                          ("CERTIFICATE OF LIVE BIRTH", 120, 40)):
+        draw.text((center, int(y * s)), text, fill="black", font=_font(int(size * s)), anchor="mt")
+
+    mother = f"{rng.choice(FIRST_NAMES)} {person['middle_name']}"
+    father = f"{rng.choice(FIRST_NAMES)} {rng.choice(MIDDLE_NAMES)} {person['last_name']}"
+    rows = [
+        ("1. NAME (First)", person["first_name"]), ("(Middle)", person["middle_name"]), ("(Last)", person["last_name"]),
+        ("2. SEX", person["sex"]), ("3. DATE OF BIRTH", _long_date(person["date_of_birth"])),
+        ("4. PLACE OF BIRTH", person["place_of_birth"]), ("5. MAIDEN NAME OF MOTHER", mother),
+        ("6. NAME OF FATHER", father), ("7. REGISTRY NO.", f"{rng.randrange(1990, 2024)}-{rng.randrange(1, 99999):05d}"),
+    ]
+    y = int(200 * s)
+    box_height = int(110 * s)
+    label_font, value_font = _font(int(18 * s)), _font(int(30 * s))
+    for label, value in rows:
+        draw.rectangle([int(60 * s), y, width - int(60 * s), y + box_height], outline=(60, 60, 60), width=max(1, int(2 * s)))
+        draw.text((int(75 * s), y + int(10 * s)), label, fill=(70, 70, 70), font=label_font)
+        draw.text((int(75 * s), y + int(45 * s)), value.upper(), fill=(15, 15, 60), font=value_font)
+        y += box_height + int(12 * s)
+
+    truth = {k: person[k] for k in ("full_name", "first_name", "middle_name", "last_name",
+                                     "date_of_birth", "sex", "place_of_birth")}
+    truth["mothers_maiden_name"] = mother
+    truth["fathers_name"] = father
+    return image, truth
+
+
+def render_other(width: int, rng: random.Random) -> Tuple[Image.Image, Dict[str, Any]]:
+    """Something that is not an ID or certificate: a receipt, a letter or a snapshot."""
+    variant = rng.choice(("receipt", "letter", "snapshot"))
+    if variant == "receipt":
+        height = int(width * rng.uniform(2.2, 3.0))
+        image = Image.new("RGB", (width, height), (252, 252, 248))
+        draw = ImageDraw.Draw(image)
+        font = _font(max(10, width // 24))
+        y = width // 20
+        while y < height - width // 10:
+            text = f"{rng.choice(['ITEM', 'RICE', 'SOAP', 'LOAD', 'BREAD'])} {rng.randrange(1, 9)} x {rng.uniform(5, 500):.2f}"
+            draw.text((width // 12, y), text, fill=(30, 30, 30), font=font)
+            y += width // 14
+    elif variant == "letter":
+        height = int(width * 1.294)  # US Letter
+        image = Image.new("RGB", (width, height), (255, 255, 255))
+        draw = ImageDraw.Draw(image)
+        s = width / 1000
+        y = int(120 * s)
+        while y < height - int(120 * s):
+            line_end = rng.randrange(int(600 * s), int(900 * s))
+            draw.line([(int(100 * s), y), (line_end, y)], fill=(60, 60, 60), width=max(1, int(8 * s)))
+            y += int(rng.choice([30, 30, 30, 70]) * s)
+    else:
+        height = int(width * rng.choice([0.75, 1.333, 0.5625]))
+        image = Image.new("RGB", (width, height), tuple(rng.randrange(0, 256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(rng.randrange(3, 12)):
+            x0, y0 = rng.randrange(0, width), rng.randrange(0, height)
+            box = [x0, y0, x0 + rng.randrange(width // 10, width // 2), y0 + rng.randrange(height // 10, height // 2)]
+            draw.ellipse(box, fill=tuple(rng.randrange(0, 256) for _ in range(3)))
+    return image, {}
+
+
+def degrade(image: Image.Image, rng: random.Random) -> Image.Image:
+    """Mimic a phone photo: slight rotation, blur and exposure change."""
+    image = image.rotate(rng.uniform(-3, 3), expand=True, fillcolor=(rng.randrange(40, 120),) * 3)
+    if rng.random() < 0.5:
+        image = image.filter(ImageFilter.GaussianBlur(rng.uniform(0.3, 1.2)))
+    factor = rng.uniform(0.85, 1.1)
+    return image.point(lambda v: min(255, int(v * factor)))
+
+
+def generate_documents(out: Path, count: int, widths: List[int], rng: random.Random, photo_noise: bool) -> List[Dict]:
+    entries = []
+    for i in range(count):
+        kind = DOCUMENT_KINDS[i % len(DOCUMENT_KINDS)]
+        width = widths[(i // len(DOCUMENT_KINDS)) % len(widths)]
+        person = random_person(rng)
+        if kind == "birth_certificate":
+            image, truth = render_birth_certificate(person, width, rng)
+        elif kind == "other":
+            image, truth = render_other(width, rng)
+        else:
+            image, truth = render_card(kind, person, width, rng)
+        if photo_noise:
+            image = degrade(image, rng)
+
+        folder = out / "documents" / kind
+        folder.mkdir(parents=True, exist_ok=True)
+        name = f"{kind}_{width}w_{i:05d}"
+        image.save(folder / f"{name}.jpg", "JPEG", quality=rng.randrange(60, 95))
+        (folder / f"{name}.json").write_text(json.dumps(truth, indent=2))
+        entries.append({"path": f"documents/{kind}/{name}.jpg", "kind": kind, "width": width, "height": image.height})
+    return entries
+
+
+def form_field_names(field_count: int, variant_ratio: float, max_variant: int, rng: random.Random) -> List[str]:
+    """
+    Field names for a synthetic form: a share of variant_ratio are numbered
+    variants (_2.._max_variant) of base names; the rest are base names, with
+    generic extras once the known bases run out.
+    """
+    names: List[str] = []
+    used = set()
+    bases = list(FORM_FIELD_BASES)
+    rng.shuffle(bases)
+    extra = 0
+    while len(names) < field_count:
+        if names and rng.random() < variant_ratio:
+            base = rng.choice([n for n in names if not n.rsplit("_", 1)[-1].isdigit()] or names)
+            name = f"{base}_{rng.randrange(2, max_variant + 1)}"
+        elif bases:
+            name = bases.pop()
+        else:
+            extra += 1
+            name = f"section{extra // 10 + 1}_item_{extra % 10 + 1}_text"
+        if name not in used:
+            used.add(name)
+            names.append(name)
+    return names
+
+
+def _pdf_string(text: str) -> str:
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def build_fillable_pdf(field_names: List[str], fields_per_page: int = 25) -> bytes:
+    """
+    Minimal AcroForm PDF (Letter pages, Helvetica labels) with one text
+    field per name. Written by hand so generation stays fast at thousands
+    of fields and does not depend on a particular PyPDFForm version.
+    """
+    pages = [field_names[i:i + fields_per_page] for i in range(0, len(field_names), fields_per_page)] or [[]]
+    objects: List[str] = []
+
+    def add(body: str) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add("")   # filled in once the page and field ids are known
+    page_tree = add("")
+    font = add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids, field_ids = [], []
+    for page_fields in pages:
+        page_id = len(objects) + 1
+        content_lines, annots = ["BT /F1 9 Tf"], []
+        for row, name in enumerate(page_fields):
+            y = 750 - row * 28
+            content_lines.append(f"1 0 0 1 40 {y + 4} Tm {_pdf_string(name.replace('_', ' ').title())} Tj")
+            annots.append((name, f"[220 {y} 560 {y + 18}]"))
+        content_lines.append("ET")
+        stream = "\n".join(content_lines)
+        content_id = page_id + 1
+        widget_ids = list(range(page_id + 2, page_id + 2 + len(annots)))
+        add(f"<< /Type /Page /Parent {page_tree} 0 R /MediaBox [0 0 612 792] /Contents {content_id} 0 R "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> /Annots [{' '.join(f'{w} 0 R' for w in widget_ids)}] >>")
+        add(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        for name, rect in annots:
+            field_ids.append(add(
+                f"<< /Type /Annot /Subtype /Widget /FT /Tx /T {_pdf_string(name)} /Rect {rect} /F 4 "
+                f"/P {page_id} 0 R /DA (/Helv 10 Tf 0 g) /MK << /BC [0 0 0] >> >>"
+            ))
+        page_ids.append(page_id)
+
+    objects[catalog - 1] = (
+        f"<< /Type /Catalog /Pages {page_tree} 0 R /AcroForm << /Fields [{' '.join(f'{f} 0 R' for f in field_ids)}] "
+        f"/NeedAppearances true /DA (/Helv 10 Tf 0 g) /DR << /Font << /Helv {font} 0 R >> >> >> >>"
+    )
+    objects[page_tree - 1] = (
+        f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in page_ids)}] /Count {len(page_ids)} >>"
+    )
+
+    out = bytearray(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def generate_forms(out: Path, count: int, field_counts: List[int], variant_ratio: float, max_variant: int,
+                   rng: random.Random) -> List[Dict]:
+    folder = out / "forms"
+    folder.mkdir(parents=True, exist_ok=True)
+    entries = []
+    for i in range(count):
+        field_count = field_counts[i % len(field_counts)]
+        names = form_field_names(field_count, variant_ratio, max_variant, rng)
+        name = f"form_{field_count}f_{i:04d}"
+        (folder / f"{name}.pdf").write_bytes(build_fillable_pdf(names))
+        (folder / f"{name}.json").write_text(json.dumps({"fields": names}, indent=2))
+        variants = sum(1 for n in names if n.rsplit("_", 1)[-1].isdigit())
+        entries.append({"path": f"forms/{name}.pdf", "fields": field_count, "variant_fields": variants})
+    return entries
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic document and form corpus.")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--documents", type=int, default=60, help="Document images to render")
+    parser.add_argument("--widths", default="640,1280,2560", help="Comma-separated image widths in pixels")
+    parser.add_argument("--no-photo-noise", action="store_true", help="Skip rotation/blur/exposure noise")
+    parser.add_argument("--forms", type=int, default=6, help="PDF forms to generate")
+    parser.add_argument("--fields", default="30,300", help="Comma-separated field counts, cycled over forms")
+    parser.add_argument("--variant-ratio", type=float, default=0.3, help="Share of fields that are _2/_3 variants")
+    parser.add_argument("--max-variant", type=int, default=3, help="Highest variant number")
+    parser.add_argument("--seed", type=int, default=2025)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        "seed": args.seed,
+        "documents": generate_documents(out, args.documents, [int(w) for w in args.widths.split(",")], rng,
+                                        not args.no_photo_noise),
+        "forms": generate_forms(out, args.forms, [int(f) for f in args.fields.split(",")], args.variant_ratio,
+                                args.max_variant, rng),
+    }
+    (out / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    print(f"wrote {len(manifest['documents'])} documents and {len(manifest['forms'])} forms to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
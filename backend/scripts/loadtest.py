@@ -0,0 +1,364 @@
+"""
+End-to-end load test for the FastAPI app.
+
+Drives the real ASGI app in-process (register -> login -> extract-upload ->
+auto-fill -> downloads) against the local Qwen stand-in and a throwaway
+SQLite database, then reports throughput, p50/p95/p99 latency per endpoint
+and event-loop lag. Exits non-zero when a threshold is exceeded, so it can
+gate capacity-affecting changes.
+
+Run from the backend directory (needs aiosqlite):
+
+    python -m scripts.loadtest --concurrency 20 --duration 30
+    python -m scripts.loadtest --rate 5 --duration 60 --max-p95 auto-fill=2000
+    python -m scripts.loadtest --rate 5 --duration 60 --hedge
+    python -m scripts.loadtest --concurrency 20 --duration 30 --max-admission-rejections 0
+
+Every in-process request comes from 127.0.0.1, so the run treats that as
+a trusted reverse proxy (ADMISSION_TRUSTED_PROXIES) and each journey sends
+its resident's own address in X-Forwarded-For, as residents behind a
+proxy would. Admission control then caps concurrency per resident, not
+for the whole run; --max-admission-rejections 0 catches a regression
+there: a shared key turns concurrent journeys into 429s.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from . import qwen_stub
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+TEST_DATA_DIR = BACKEND_ROOT / "test_data"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    """Collects per-endpoint latencies and outcomes."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, name: str, request) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await request
+        except Exception:
+            self.errors[name] += 1
+            self.latencies[name].append(time.perf_counter() - start)
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        self.statuses[name][response.status_code] += 1
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        report = {}
+        for name, values in sorted(self.latencies.items()):
+            report[name] = {
+                "count": len(values),
+                "errors": self.errors[name],
+                "error_rate": self.errors[name] / len(values),
+                "rps": len(values) / elapsed,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": max(values) * 1000,
+                "statuses": dict(self.statuses[name]),
+            }
+        return report
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a task that asked to sleep `interval`."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "p50_ms": percentile(self.lags, 50) * 1000,
+            "p99_ms": percentile(self.lags, 99) * 1000,
+            "max_ms": max(self.lags, default=0.0) * 1000,
+        }
+
+
+async def setup_database(db_path: str):
+    """Point the app at a fresh SQLite database with all tables created."""
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    from app.core.db import Base
+    from app.dependencies.database import get_db
+    from app.main import app
+    from app.models import user, submission, resident_profile  # noqa: F401
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def get_test_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = get_test_db
+    return engine
+
+
+async def resident_journey(client: httpx.AsyncClient, recorder: Recorder, user_no: int, files: Dict[str, bytes]):
+    """One resident: register, log in, extract an ID, auto-fill a form, download it."""
+    email = f"loadtest-{os.getpid()}-{user_no}@example.com"
+    password = "loadtest-password"
+
+    await recorder.call("register", client.post(
+        "/api/v1/auth/register", json={"email": email, "password": password, "name": f"Resident {user_no}"}
+    ))
+    login = await recorder.call("login", client.post(
+        "/api/v1/auth/login", json={"email": email, "password": password}
+    ))
+    if login is None or login.status_code != 200:
+        return
+    params = {"user_id": login.json()["id"]}
+    # The resident's own address, forwarded by the trusted in-process "proxy"
+    headers = {"x-forwarded-for": f"10.{user_no >> 16 & 255}.{user_no >> 8 & 255}.{user_no & 255}"}
+
+    await recorder.call("extract-upload", client.post(
+        "/api/v1/test/extract-upload",
+        params=params,
+        headers=headers,
+        files={"file": ("id.jpg", files["document"], "image/jpeg")},
+    ))
+    auto_fill = await recorder.call("auto-fill", client.post(
+        "/api/v1/test/pdf/auto-fill",
+        params=params,
+        headers=headers,
+        files={
+            "pdf_form": ("form.pdf", files["form"], "application/pdf"),
+            "document": ("id.jpg", files["document"], "image/jpeg"),
+        },
+    ))
+    if auto_fill is None or auto_fill.status_code != 200:
+        return
+
+    result = auto_fill.json()
+    session_id = result.get("session_id")
+    if session_id:
+        await recorder.call("session-download", client.get(f"/api/v1/test/pdf/sessions/{session_id}/download"))
+    filled_pdf_path = result.get("filled_pdf_path")
+    if filled_pdf_path:
+        await recorder.call("download", client.get(f"/api/v1/test/pdf/download/{Path(filled_pdf_path).name}"))
+        os.unlink(filled_pdf_path)
+
+
+async def run_load(args) -> Dict:
+    from app.main import app
+
+    from app.core.admission import upload_admission
+    from app.core.hedging import qwen_hedger
+
+    stub = qwen_stub.StubQwenClient(
+        median_s=args.qwen_median_ms / 1000,
+        tail_probability=args.qwen_tail_probability,
+        seed=args.seed,
+    )
+    qwen_stub.install(stub)
+
+    files = {
+        "document": (TEST_DATA_DIR / args.document).read_bytes(),
+        "form": (TEST_DATA_DIR / args.form).read_bytes(),
+    }
+    recorder = Recorder()
+    monitor = LoopLagMonitor()
+    user_numbers = itertools.count()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = await setup_database(os.path.join(tmp_dir, "loadtest.db"))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+            monitor.start()
+            start = time.perf_counter()
+            deadline = start + args.duration
+
+            if args.rate:
+                # Open loop: Poisson arrivals regardless of how fast the app answers
+                rng = random.Random(args.seed)
+                in_flight = set()
+                while time.perf_counter() < deadline:
+                    task = asyncio.create_task(resident_journey(client, recorder, next(user_numbers), files))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                    await asyncio.sleep(rng.expovariate(args.rate))
+                if in_flight:
+                    await asyncio.gather(*in_flight)
+            else:
+                # Closed loop: each virtual user starts a new journey when the last one ends
+                async def virtual_user():
+                    while time.perf_counter() < deadline:
+                        await resident_journey(client, recorder, next(user_numbers), files)
+
+                await asyncio.gather(*(virtual_user() for _ in range(args.concurrency)))
+
+            elapsed = time.perf_counter() - start
+            await monitor.stop()
+        await engine.dispose()
+
+    return {
+        "config": {
+            "mode": "open" if args.rate else "closed",
+            "concurrency": None if args.rate else args.concurrency,
+            "rate": args.rate or None,
+            "duration_s": args.duration,
+            "qwen_median_ms": args.qwen_median_ms,
+            "hedging": args.hedge,
+        },
+        "elapsed_s": elapsed,
+        "journeys": next(user_numbers),
+        "endpoints": recorder.summary(elapsed),
+        "event_loop_lag": monitor.summary(),
+        "qwen_calls": stub.calls,
+        "qwen_hedging": qwen_hedger.stats(),
+        "admission": upload_admission.stats(),
+    }
+
+
+def parse_thresholds(pairs: List[str]) -> Dict[str, float]:
+    thresholds = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition("=")
+        if not value:
+            raise SystemExit(f"Threshold must look like endpoint=milliseconds, got {pair!r}")
+        thresholds[name] = float(value)
+    return thresholds
+
+
+def check_thresholds(report: Dict, args) -> List[str]:
+    failures = []
+    endpoints = report["endpoints"]
+    for key, limits in (("p95_ms", parse_thresholds(args.max_p95)), ("p99_ms", parse_thresholds(args.max_p99))):
+        for name, limit in limits.items():
+            if name not in endpoints:
+                failures.append(f"{name}: no requests recorded")
+            elif endpoints[name][key] > limit:
+                failures.append(f"{name}: {key} {endpoints[name][key]:.0f} > {limit:.0f}")
+    for name, stats in endpoints.items():
+        if stats["error_rate"] > args.max_error_rate:
+            failures.append(f"{name}: error rate {stats['error_rate']:.2%} > {args.max_error_rate:.2%}")
+    if args.min_journeys_per_s is not None:
+        throughput = report["journeys"] / report["elapsed_s"]
+        if throughput < args.min_journeys_per_s:
+            failures.append(f"throughput {throughput:.2f} journeys/s < {args.min_journeys_per_s}")
+    if args.max_loop_lag_ms is not None and report["event_loop_lag"]["p99_ms"] > args.max_loop_lag_ms:
+        failures.append(f"event loop lag p99 {report['event_loop_lag']['p99_ms']:.0f} > {args.max_loop_lag_ms:.0f}")
+    if args.max_admission_rejections is not None:
+        rejected = admission_rejections(report["admission"])
+        if rejected > args.max_admission_rejections:
+            failures.append(f"admission rejected {rejected} requests > {args.max_admission_rejections}")
+    return failures
+
+
+def admission_rejections(stats: Dict) -> int:
+    return stats["rejected_user_limit"] + stats["rejected_queue_full"] + stats["rejected_queue_timeout"]
+
+
+def print_report(report: Dict) -> None:
+    print(f"{report['journeys']} journeys in {report['elapsed_s']:.1f}s "
+          f"({report['journeys'] / report['elapsed_s']:.2f}/s)")
+    print(f"{'endpoint':<18}{'count':>7}{'err':>6}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, s in report["endpoints"].items():
+        print(f"{name:<18}{s['count']:>7}{s['errors']:>6}{s['rps']:>8.2f}"
+              f"{s['p50_ms']:>9.0f}{s['p95_ms']:>9.0f}{s['p99_ms']:>9.0f}{s['max_ms']:>9.0f}")
+    lag = report["event_loop_lag"]
+    print(f"event loop lag: p50 {lag['p50_ms']:.1f}ms  p99 {lag['p99_ms']:.1f}ms  max {lag['max_ms']:.1f}ms")
+    admission = report["admission"]
+    print(f"admission: rejected {admission_rejections(admission)} (per-user limit {admission['rejected_user_limit']}, "
+          f"queue full {admission['rejected_queue_full']}, queue timeout {admission['rejected_queue_timeout']})")
+    print(f"qwen calls: {report['qwen_calls']}")
+    for kind, h in report["qwen_hedging"]["kinds"].items():
+        print(f"  {kind:<12} calls {h['calls']:>6}  hedged {h['hedged']:>5} ({h['extra_request_ratio']:.1%})  "
+              f"hedge wins {h['hedge_wins']:>5}  call p99 {h['call_p99_ms']}ms  attempt p99 {h['attempt_p99_ms']}ms")
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the SmartBarangay Forms API in-process.")
+    parser.add_argument("--concurrency", type=int, default=10, help="Virtual users (closed loop)")
+    parser.add_argument("--rate", type=float, default=0.0, help="Journeys per second (open loop); overrides --concurrency")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to generate load")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--document", default="sample_birth_cert.jpg", help="Image in test_data to upload")
+    parser.add_argument("--form", default="senior_citizen_form_all.pdf", help="PDF form in test_data to fill")
+    parser.add_argument("--qwen-median-ms", type=float, default=50.0, help="Median stand-in model latency")
+    parser.add_argument("--qwen-tail-probability", type=float, default=0.02, help="Share of slow model calls")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-p95", action="append", metavar="ENDPOINT=MS", help="Fail if endpoint p95 exceeds MS")
+    parser.add_argument("--max-p99", action="append", metavar="ENDPOINT=MS", help="Fail if endpoint p99 exceeds MS")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Fail if any endpoint's error rate exceeds this")
+    parser.add_argument("--min-journeys-per-s", type=float, default=None, help="Fail below this end-to-end throughput")
+    parser.add_argument("--max-loop-lag-ms", type=float, default=None, help="Fail if event loop lag p99 exceeds this")
+    parser.add_argument("--max-admission-rejections", type=int, default=None,
+                        help="Fail if admission control rejects more requests than this (429/503)")
+    parser.add_argument("--json", dest="json_path", help="Also write the report as JSON to this path")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Turn on hedged Qwen requests; compare p99 and qwen calls against a run without")
+    parser.add_argument("--shared-cache", action="store_true",
+                        help="Keep the node-local result cache on (every journey then hits it after the first)")
+    args = parser.parse_args(argv)
+
+    # Settings are read at import time, so this must happen before the app is imported
+    if not args.shared_cache:
+        os.environ["SHARED_CACHE_ENABLED"] = "false"
+    os.environ["QWEN_HEDGING_ENABLED"] = "true" if args.hedge else "false"
+    os.environ["ADMISSION_TRUSTED_PROXIES"] = "127.0.0.1"
+    # A fresh near-duplicate index each run, not the one in APP_DATA_DIR
+    os.environ["PHASH_INDEX_PATH"] = ":memory:"
+
+    report = asyncio.run(run_load(args))
+    print_report(report)
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=2))
+
+    failures = check_thresholds(report, args)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+One-off migration: store every user's email in normalised form.
+
+Login, registration and CSV import look users up by the exact normalised
+address (auth_service.normalize_email) so the unique index on users.email
+is used. This rewrites rows stored before that change. Addresses that
+would collide with another account after normalising are reported and
+left alone for an admin to merge; addresses email_validator rejects are
+only lowercased.
+
+Run from the backend directory against the configured DATABASE_URL:
+
+    python -m scripts.normalize_emails --dry-run
+    python -m scripts.normalize_emails
+"""
+import argparse
+import asyncio
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from sqlalchemy import select, update
+
+
+async def run(args) -> int:
+    from app.core.db import SessionLocal
+    from app.models.user import User
+    from app.services.auth_service import normalize_email
+
+    async with SessionLocal() as db:
+        rows: List[Tuple[int, str]] = list((await db.execute(select(User.id, User.email))).all())
+
+        owners: Dict[str, List[int]] = defaultdict(list)
+        target: Dict[int, str] = {}
+        for user_id, email in rows:
+            try:
+                normalised = normalize_email(email)
+            except ValueError:
+                normalised = email.strip().lower()
+                print(f"user {user_id}: {email!r} is not a valid address, lowercasing only")
+            owners[normalised].append(user_id)
+            target[user_id] = normalised
+
+        changes = []
+        for user_id, email in rows:
+            normalised = target[user_id]
+            if len(owners[normalised]) > 1:
+                continue
+            if normalised != email:
+                changes.append({"id": user_id, "email": normalised})
+        for normalised, user_ids in owners.items():
+            if len(user_ids) > 1:
+                print(f"conflict: users {user_ids} all normalise to {normalised}; merge them by hand")
+
+        print(f"{len(rows)} users, {len(changes)} to rewrite, "
+              f"{sum(1 for ids in owners.values() if len(ids) > 1)} conflicts")
+        if args.dry_run or not changes:
+            return 0
+        for start in range(0, len(changes), args.batch_size):
+            await db.execute(update(User), changes[start:start + args.batch_size])
+        await db.commit()
+        print(f"rewrote {len(changes)} emails")
+    return 0
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Normalise stored user emails.")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    parser.add_argument("--batch-size", type=int, default=500)
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Local stand-in for the DashScope/Qwen OpenAI-compatible client.
+
+Returns canned extraction and mapping responses after a simulated latency,
+so the API can be exercised without network access or API spend.
+Like the real AsyncOpenAI client, calls can be cancelled mid-flight.
+"""
+import asyncio
+import json
+import random
+import re
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+SAMPLE_EXTRACTION = {
+    "full_name": "Juan Miguel Dela Cruz",
+    "first_name": "Juan",
+    "middle_name": "Miguel",
+    "last_name": "Dela Cruz",
+    "id_number": "1234-5678-9012-3456",
+    "date_of_birth": "1990-01-15",
+    "sex": "Male",
+    "address": "123 Mabuhay Street, Barangay 1, Quezon City, Metro Manila",
+}
+
+
+class _Completions:
+    def __init__(self, stub: "StubQwenClient"):
+        self._stub = stub
+
+    async def create(self, model: str, messages: List[Dict[str, Any]], **kwargs) -> SimpleNamespace:
+        self._stub.calls += 1
+        await asyncio.sleep(self._stub.sample_latency())
+        if model.startswith("qwen3-vl") or model.startswith("qwen-vl"):
+            content = "```json\n" + json.dumps(SAMPLE_EXTRACTION) + "\n```"
+        else:
+            content = json.dumps(_fake_mapping(_message_text(messages)))
+        message = SimpleNamespace(role="assistant", content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message)])
+
+
+class StubQwenClient:
+    """
+    Drop-in for the object returned by get_qwen_client().
+
+    Latency is log-normal around median_s; tail_probability of calls are
+    slowed down by tail_multiplier to mimic the long tail seen in production.
+    """
+
+    def __init__(
+        self,
+        median_s: float = 0.05,
+        sigma: float = 0.3,
+        tail_probability: float = 0.02,
+        tail_multiplier: float = 10.0,
+        seed: int | None = None,
+    ):
+        self.median_s = median_s
+        self.sigma = sigma
+        self.tail_probability = tail_probability
+        self.tail_multiplier = tail_multiplier
+        self.calls = 0
+        self._random = random.Random(seed)
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def sample_latency(self) -> float:
+        latency = self.median_s * self._random.lognormvariate(0.0, self.sigma)
+        if self._random.random() < self.tail_probability:
+            latency *= self.tail_multiplier
+        return latency
+
+
+def _message_text(messages: List[Dict[str, Any]]) -> str:
+    content = messages[-1]["content"]
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def _fake_mapping(prompt: str) -> Dict[str, Any]:
+    """Fill roughly half of the form fields listed in a mapping prompt."""
+    match = re.search(r"PDF FORM FIELDS:\s*(\[.*?\])\s*INSTRUCTIONS:", prompt, re.DOTALL)
+    form_fields = json.loads(match.group(1)) if match else []
+    values = list(SAMPLE_EXTRACTION.values())
+    filled = {name: values[i % len(values)] for i, name in enumerate(form_fields) if i % 2 == 0}
+    return {
+        "mappings": [],
+        "filled_fields": filled,
+        "missing_fields": [name for name in form_fields if name not in filled],
+    }
+
+
+def install(client: StubQwenClient) -> None:
+    """Route every Qwen call made by the services through the stub."""
+    from app.services import ai_service, pdf_mapping_service
+
+    ai_service.get_qwen_client = lambda: client
+    pdf_mapping_service.get_qwen_client = lambda: client